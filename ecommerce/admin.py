@@ -8,3 +8,12 @@ admin.site.register(Product)
 admin.site.register(Review)
 admin.site.register(OrderItem)
 admin.site.register(Order)
+admin.site.register(DailySales)
+admin.site.register(Stock)
+admin.site.register(StockReservation)
+admin.site.register(ArchivedOrder)
+admin.site.register(ArchivedOrderItem)
+admin.site.register(CoPurchase)
+admin.site.register(ProductRecommendation)
+admin.site.register(Bestseller)
+admin.site.register(OutboxEvent)
@@ -0,0 +1,45 @@
+from . import sharding
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+ORDER_FIELDS = ('order_uuid', 'total_price', 'created_on', 'completed_on', 'payment_mode', 'delivery_mode',
+                'shipping_address', 'status', 'customer_id')
+ORDER_ITEM_FIELDS = ('order_item_uuid', 'product_id', 'quantity', 'item_price', 'created_on', 'customer_id')
+
+
+def archivable_orders(cutoff):
+    return Order.objects.filter(status='Completed', created_on__lt=cutoff)
+
+
+def archive_orders(queryset, batch_size=500):
+    """
+    Copies the completed orders of `queryset` and their items into the archive tables and removes
+    them from the live ones, `batch_size` orders per transaction.
+    `queryset` must read a single shard, see `sharding.scatter`.
+    :return: iterator of the number of orders archived per batch
+    """
+    shard = sharding.shard_of(queryset)
+    while True:
+        with sharding.use_shard(shard), sharding.atomic(shard):
+            orders = list(queryset.filter(status='Completed').values('id', *ORDER_FIELDS)[:batch_size])
+            if not orders:
+                return
+
+            archived = ArchivedOrder.objects.bulk_create([
+                ArchivedOrder(**{field: order[field] for field in ORDER_FIELDS}) for order in orders
+            ])
+            # bulk_create doesn't return primary keys on every backend, look them up by uuid
+            archived_ids = dict(ArchivedOrder.objects.filter(
+                order_uuid__in=[order.order_uuid for order in archived]
+            ).values_list('order_uuid', 'id'))
+            order_ids = {order['id']: archived_ids[order['order_uuid']] for order in orders}
+
+            items = OrderItem.objects.filter(order_id__in=order_ids.keys()).values('order_id', *ORDER_ITEM_FIELDS)
+            ArchivedOrderItem.objects.bulk_create([
+                ArchivedOrderItem(order_id=order_ids[item['order_id']],
+                                  **{field: item[field] for field in ORDER_ITEM_FIELDS})
+                for item in items
+            ], batch_size=batch_size)
+
+            OrderItem.objects.filter(order_id__in=order_ids.keys()).delete()
+            Order.objects.filter(id__in=order_ids.keys()).delete()
+        yield len(orders)
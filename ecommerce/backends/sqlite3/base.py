@@ -0,0 +1,30 @@
+"""
+SQLite backend tuned for a few concurrent gunicorn workers.
+
+Extra OPTIONS on top of the stock backend:
+    pragmas: dict of PRAGMA name -> value run on every new connection
+    transaction_mode: 'IMMEDIATE' makes atomic() take the write lock up front, so two writers
+        never both read and then deadlock on the upgrade, which is what raises "database is locked"
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = kwargs.pop('pragmas', {})
+        self.transaction_mode = kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f"BEGIN {self.transaction_mode}")
+        else:
+            super()._start_transaction_under_autocommit()
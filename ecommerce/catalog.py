@@ -0,0 +1,199 @@
+"""
+Materialized pages of the public product list.
+
+A list page only depends on its URL, so the first request for one renders it, compresses it once per
+encoding and stores the bytes under CATALOG_SNAPSHOT_DIR, where every worker of the server finds them.
+Each worker also keeps the most recent CATALOG_SNAPSHOT_MEMORY_PAGES of them in memory. Later requests
+are answered with those bytes without touching the database or the serializers.
+
+Pages are grouped by scope, a category or `all` for the unfiltered list. Each scope has a generation
+token file, and pages are stored under the current token. A product change replaces the token of its
+category and of `all` once committed, so only those pages are rebuilt, on their next request. Pages
+older than CATALOG_SNAPSHOT_MAX_AGE are rebuilt too, for changes this server never sees (bulk updates,
+other servers).
+"""
+import gzip
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import slugify
+from rest_framework.renderers import JSONRenderer
+
+from .middleware import CompressionMiddleware, brotli
+from .models import PRODUCT_CATEGORIES, Product
+
+ALL = 'all'
+CATEGORIES = {category for category, _ in PRODUCT_CATEGORIES}
+# query parameters a snapshotted page may have, anything else is served by the view as usual
+PAGE_PARAMS = {'category', 'page'}
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def snapshot_dir():
+    return Path(getattr(settings, 'CATALOG_SNAPSHOT_DIR', Path(settings.BASE_DIR) / 'catalog_snapshot'))
+
+
+def scope_of(category):
+    return slugify(category) if category else ALL
+
+
+def page_key(request):
+    """(scope, URL digest) of the page a list request asks for, None when it isn't served from snapshots"""
+    if not getattr(settings, 'CATALOG_SNAPSHOT_ENABLED', True) or request.method != 'GET':
+        return None
+    params = request.query_params
+    if not set(params) <= PAGE_PARAMS or any(len(params.getlist(name)) > 1 for name in params):
+        return None
+    category = params.get('category')
+    if category is not None and category not in CATEGORIES:
+        return None
+    # the browsable API and indented JSON aren't worth storing
+    if not isinstance(request.accepted_renderer, JSONRenderer) or request.accepted_media_type != 'application/json':
+        return None
+    # links and image URLs are absolute, so the host and query string are part of the page
+    return scope_of(category), hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()[:20]
+
+
+def generation(scope):
+    try:
+        return (snapshot_dir() / f"{scope}.generation").read_text()
+    except FileNotFoundError:
+        return 'initial'
+
+
+def _page_path(scope, token, digest, encoding):
+    suffix = {'identity': '', 'gzip': '.gz', 'br': '.br'}[encoding]
+    return snapshot_dir() / 'pages' / scope / token / f"{digest}.json{suffix}"
+
+
+def _remember(key, built_at, body):
+    with _memory_lock:
+        _memory[key] = (built_at, body)
+        _memory.move_to_end(key)
+        while len(_memory) > getattr(settings, 'CATALOG_SNAPSHOT_MEMORY_PAGES', 512):
+            _memory.popitem(last=False)
+
+
+def _read(scope, digest, encoding):
+    """Stored bytes of a page in `encoding`, None when missing or too old"""
+    token = generation(scope)
+    key = (scope, token, digest, encoding)
+    oldest = time.time() - getattr(settings, 'CATALOG_SNAPSHOT_MAX_AGE', 300)
+    with _memory_lock:
+        cached = _memory.get(key)
+    if cached is not None and cached[0] >= oldest:
+        return cached[1]
+    try:
+        with open(_page_path(scope, token, digest, encoding), 'rb') as page:
+            built_at = os.fstat(page.fileno()).st_mtime
+            body = page.read()
+    except FileNotFoundError:
+        return None
+    if built_at < oldest:
+        return None
+    _remember(key, built_at, body)
+    return body
+
+
+def _write(path, body):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    temporary.write_bytes(body)
+    os.replace(temporary, path)
+
+
+def _encodings(body):
+    """The page in every encoding worth serving, compressed once at the highest level"""
+    variants = {'identity': body}
+    if len(body) < getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024):
+        return variants
+    variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11)
+    return {encoding: data for encoding, data in variants.items() if len(data) <= len(body)}
+
+
+def _response(body, encoding):
+    response = HttpResponse(body, content_type='application/json')
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def _negotiate(request):
+    return CompressionMiddleware.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', '')) or 'identity'
+
+
+def cached_response(key, request):
+    """The stored page in the encoding the client prefers, None when it has to be built"""
+    scope, digest = key
+    encoding = _negotiate(request)
+    body = _read(scope, digest, encoding)
+    if body is None and encoding != 'identity':
+        # small pages are only stored uncompressed
+        body = _read(scope, digest, 'identity')
+        encoding = 'identity'
+    return _response(body, encoding) if body is not None else None
+
+
+def materialize(key, request, body):
+    """
+    Stores a freshly rendered page under the generation read before it was rendered, so a page built
+    while its products changed lands in an old generation and is never served.
+    """
+    scope, digest = key
+    token = generation(scope)
+    variants = _encodings(body)
+    built_at = time.time()
+    for encoding, data in variants.items():
+        _write(_page_path(scope, token, digest, encoding), data)
+        _remember((scope, token, digest, encoding), built_at, data)
+    encoding = _negotiate(request)
+    if encoding not in variants:
+        encoding = 'identity'
+    return _response(variants[encoding], encoding)
+
+
+def _invalidate_now(scopes):
+    directory = snapshot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    for scope in scopes:
+        token = uuid.uuid4().hex
+        _write(directory / f"{scope}.generation", token.encode())
+        # pages of older generations are unreachable now
+        pages = directory / 'pages' / scope
+        if pages.is_dir():
+            for old in pages.iterdir():
+                if old.name != token:
+                    shutil.rmtree(old, ignore_errors=True)
+
+
+def invalidate(categories=None):
+    """
+    Drops the pages of `categories` and of the unfiltered list once the current transaction commits,
+    every scope when `categories` is None
+    """
+    if not getattr(settings, 'CATALOG_SNAPSHOT_ENABLED', True):
+        return
+    if categories is None:
+        scopes = {ALL} | {scope_of(category) for category in CATEGORIES}
+    else:
+        scopes = {ALL} | {scope_of(category) for category in categories if category}
+    transaction.on_commit(lambda: _invalidate_now(scopes))
+
+
+def invalidate_products(product_ids):
+    invalidate(set(Product.objects.filter(id__in=product_ids).values_list('category', flat=True)))
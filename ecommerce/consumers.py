@@ -0,0 +1,50 @@
+"""Outbox handlers, each one is called by `outbox.drain` with the payloads of a batch of events"""
+from collections import defaultdict
+
+from . import leaderboards, recommendations, reviews, sharding
+from .outbox import handler
+from .sales import record_completed_orders
+
+
+def completed_orders(events):
+    """
+    {shard: ids of the orders that completed there}, order ids are only unique within a shard.
+    Events written before sharding have no shard, their orders are in `default`.
+    """
+    by_shard = defaultdict(list)
+    for event in events:
+        if event['status'] == 'Completed':
+            by_shard[event.get('shard', 'default')].append(event['order_id'])
+    return by_shard
+
+
+@handler('order.transitioned')
+def record_completed_sales(events):
+    """Keeps the daily sales rollups up to date as orders complete"""
+    for shard, order_ids in completed_orders(events).items():
+        with sharding.use_shard(shard):
+            record_completed_orders(order_ids)
+
+
+@handler('order.transitioned')
+def update_recommendations(events):
+    """Feeds completed orders into the co-purchase matrix"""
+    for shard, order_ids in completed_orders(events).items():
+        with sharding.use_shard(shard):
+            recommendations.add_orders(order_ids)
+
+
+@handler('order.transitioned')
+def update_bestsellers(events):
+    """Counts completed orders in the bestseller leaderboards"""
+    for shard, order_ids in completed_orders(events).items():
+        with sharding.use_shard(shard):
+            leaderboards.add_orders(order_ids)
+
+
+@handler('review.created')
+@handler('review.updated')
+@handler('review.deleted')
+def update_ratings(events):
+    """Recomputes the rating of the products whose reviews changed, once per batch"""
+    reviews.refresh_ratings({event['product_id'] for event in events if event['product_id'] is not None})
@@ -0,0 +1,81 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+# Set while a read-only request may be served from a replica
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def _pin_key(user):
+    return f"db-primary-pin:{user.pk}"
+
+
+def _pin_cache():
+    # the next request of a user may reach any worker, only a shared cache makes them all see the pin
+    return caches[getattr(settings, 'DATABASE_REPLICA_PIN_CACHE', None) or 'default']
+
+
+def pin_to_primary(user):
+    """Sends the reads of `user` to the primary for a while so they see their own writes"""
+    if user.is_authenticated and replica_aliases():
+        _pin_cache().set(_pin_key(user), True, getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 10))
+
+
+def is_pinned(user):
+    return user.is_authenticated and bool(_pin_cache().get(_pin_key(user)))
+
+
+@contextmanager
+def read_from_replica():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes always go to `default`. Reads go to one of `settings.DATABASE_REPLICAS` only inside
+    `read_from_replica()`, every other read stays on `default`.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if replicas and _use_replica.get():
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+class ReplicaReadMixin:
+    """Serves safe requests from a read replica unless the user just wrote something"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned(request.user):
+            self._replica_token = _use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token:
+            _use_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
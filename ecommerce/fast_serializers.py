@@ -0,0 +1,137 @@
+"""
+Read-only serializers for list endpoints that build plain dicts from `.values()` rows instead of
+model instances. Each one mirrors the output of the ModelSerializer named in its docstring,
+key order included, so either can serve the same endpoint.
+"""
+from django.core.files.storage import default_storage
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+
+def as_decimal_string(value, request):
+    return None if value is None else f"{value:.2f}"
+
+
+def as_datetime_string(value, request):
+    if value is None:
+        return None
+    value = timezone.localtime(value) if timezone.is_aware(value) else value
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def as_file_url(value, request):
+    if not value:
+        return None
+    url = default_storage.url(value)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+class ValuesSerializer:
+    """
+    `fields` maps each output key to a `.values()` lookup, or to a (lookup, converter) pair
+    when the raw column needs the same formatting the DRF field would apply
+    """
+    fields = {}
+
+    def __init__(self, rows, request=None, fields=None, known=None):
+        """
+        `rows` is a queryset, or rows already fetched through `values()`, e.g. a page of them.
+        `fields` limits the output to these keys, see `requested_fields`.
+        `known` gives the value of keys that are the same on every row, their columns aren't selected.
+        """
+        self.only = fields
+        self.known = known or {}
+        self.rows = self.values(rows, fields, self.known) if isinstance(rows, QuerySet) else rows
+        self.request = request
+
+    @classmethod
+    def columns(cls, fields=None):
+        return [
+            (key, spec if isinstance(spec, tuple) else (spec, None))
+            for key, spec in cls.fields.items() if fields is None or key in fields
+        ]
+
+    @classmethod
+    def values(cls, queryset, fields=None, known=()):
+        """Selects only the columns, and joins, the output keys need"""
+        return queryset.values(*[lookup for key, (lookup, _) in cls.columns(fields) if key not in known])
+
+    @classmethod
+    def requested_fields(cls, request):
+        """
+        Output keys picked with `?fields=a,b` or dropped with `?exclude=c`, unknown names are a 400.
+        None when the request asks for every key.
+        """
+        picked = request.query_params.get('fields')
+        dropped = request.query_params.get('exclude')
+        if not picked and not dropped:
+            return None
+        picked = {key for key in (picked or '').split(',') if key}
+        dropped = {key for key in (dropped or '').split(',') if key}
+        unknown = (picked | dropped).difference(cls.fields)
+        if unknown:
+            raise ValidationError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        keys = (picked or set(cls.fields)) - dropped
+        return [key for key in cls.fields if key in keys]
+
+    @property
+    def data(self):
+        columns = self.columns(self.only)
+        request = self.request
+        known = self.known
+        return [
+            {
+                key: known[key] if key in known else converter(row[lookup], request) if converter else row[lookup]
+                for key, (lookup, converter) in columns
+            }
+            for row in self.rows
+        ]
+
+
+class ProductValuesSerializer(ValuesSerializer):
+    """Same output as ProductSerializer"""
+    fields = {
+        'id': 'id',
+        'shop_name': 'shop__name',
+        'product_uuid': 'product_uuid',
+        'rating_average': 'rating__average',
+        'rating_count': 'rating__count',
+        'name': 'name',
+        'price': ('price', as_decimal_string),
+        'category': 'category',
+        'description': 'description',
+        'image': ('image', as_file_url),
+        'shop': 'shop_id',
+    }
+
+
+class ReviewValuesSerializer(ValuesSerializer):
+    """Same output as ReviewSerializer"""
+    fields = {
+        'id': 'id',
+        'product_name': 'product__name',
+        'user': 'user__full_name',
+        'review_uuid': 'review_uuid',
+        'text': 'text',
+        'ratings': 'ratings',
+        'product': 'product_id',
+    }
+
+
+class OrderValuesSerializer(ValuesSerializer):
+    """Same output as OrderSerializer, works for ArchivedOrder querysets too"""
+    fields = {
+        'id': 'id',
+        'customer_name': 'customer__full_name',
+        'order_uuid': 'order_uuid',
+        'total_price': ('total_price', as_decimal_string),
+        'created_on': ('created_on', as_datetime_string),
+        'payment_mode': 'payment_mode',
+        'delivery_mode': 'delivery_mode',
+        'shipping_address': 'shipping_address',
+        'status': 'status',
+        'completed_on': ('completed_on', as_datetime_string),
+        'customer': 'customer_id',
+    }
@@ -0,0 +1,206 @@
+"""
+Idempotency keys for the cart and order endpoints.
+
+A client retrying a mutation sends the same `Idempotency-Key` header with each attempt. The first attempt
+runs and its status and data are kept for IDEMPOTENCY_KEY_TTL seconds, later attempts get them back
+without running the view again. An attempt arriving while the first one still runs waits for it, for up
+to IDEMPOTENCY_WAIT seconds, so concurrent retries write once.
+
+Keys belong to the caller and are tied to the method, URL and body they were first sent with, reusing
+one for another request is refused. Server errors and throttled responses aren't kept, the next attempt
+runs again. Keys live in a per-process dict, or in IDEMPOTENCY_CACHE so every worker sees them.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import metrics
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+# Seconds a running request holds its key, in case its worker dies before storing the response
+IN_FLIGHT_TIMEOUT = 60
+
+# Entries are (request fingerprint, status, data), with status None while the first request runs
+
+
+class LocalKeys:
+    """Per-process keys in a dict, duplicates wait on a condition until the running request is done"""
+    max_keys = 100000
+
+    def __init__(self):
+        self.changed = threading.Condition()
+        # key -> (expires at, entry)
+        self.entries = {}
+
+    def claim(self, key, fingerprint):
+        """None when the caller runs the request, else the entry already stored under `key`"""
+        now = time.monotonic()
+        with self.changed:
+            stored = self.entries.get(key)
+            if stored is not None and stored[0] > now:
+                return stored[1]
+            if len(self.entries) >= self.max_keys:
+                self.prune(now)
+            self.entries[key] = (now + IN_FLIGHT_TIMEOUT, (fingerprint, None, None))
+            return None
+
+    def wait(self, key, timeout):
+        """Returns once the request running under `key` is done or `timeout` seconds passed"""
+        def done():
+            stored = self.entries.get(key)
+            return stored is None or stored[1][1] is not None
+
+        with self.changed:
+            self.changed.wait_for(done, timeout)
+
+    def finish(self, key, entry, ttl):
+        with self.changed:
+            self.entries[key] = (time.monotonic() + ttl, entry)
+            self.changed.notify_all()
+
+    def release(self, key):
+        with self.changed:
+            self.entries.pop(key, None)
+            self.changed.notify_all()
+
+    def prune(self, now):
+        """Forgets expired keys, then the oldest finished ones while there are still too many"""
+        self.entries = {key: stored for key, stored in self.entries.items() if stored[0] > now}
+        excess = len(self.entries) - self.max_keys + 1
+        if excess > 0:
+            finished = [key for key, (_, entry) in self.entries.items() if entry[1] is not None]
+            for key in finished[:excess]:
+                del self.entries[key]
+
+
+class CacheKeys:
+    """Keys in a shared Django cache, duplicates poll it until the running request is done"""
+    poll_interval = 0.05
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def claim(self, key, fingerprint):
+        while True:
+            if self.cache.add(key, (fingerprint, None, None), timeout=IN_FLIGHT_TIMEOUT):
+                return None
+            entry = self.cache.get(key)
+            # else it expired or was released since the add, try again
+            if entry is not None:
+                return entry
+
+    def wait(self, key, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            entry = self.cache.get(key)
+            if entry is None or entry[1] is not None:
+                return
+            time.sleep(min(self.poll_interval, max(deadline - time.monotonic(), 0)))
+
+    def finish(self, key, entry, ttl):
+        self.cache.set(key, entry, timeout=ttl)
+
+    def release(self, key):
+        self.cache.delete(key)
+
+
+_local_keys = LocalKeys()
+
+# the key store, read from settings once
+_keys = []
+
+
+def get_keys():
+    if not _keys:
+        alias = getattr(settings, 'IDEMPOTENCY_CACHE', None)
+        _keys.append(CacheKeys(alias) if alias else _local_keys)
+    return _keys[0]
+
+
+@receiver(setting_changed)
+def reset_idempotency_settings(setting, **kwargs):
+    if setting == 'IDEMPOTENCY_CACHE':
+        _keys.clear()
+
+
+def fingerprint(request):
+    return hashlib.sha1(b'\n'.join([
+        request.method.encode(), request.get_full_path().encode(), request.body
+    ])).hexdigest()
+
+
+def _plain(data):
+    """`data` without the serializers that ReturnDict and ReturnList keep a reference to"""
+    if isinstance(data, dict):
+        return {key: _plain(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_plain(value) for value in data]
+    return data
+
+
+def _replay(entry):
+    metrics.inc('idempotent_replays_total')
+    response = Response(entry[2], status=entry[1])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _keeps(response):
+    return isinstance(response, Response) and response.status_code < 500 and \
+        response.status_code != status.HTTP_429_TOO_MANY_REQUESTS
+
+
+def idempotent(handler):
+    """
+    Makes a view handler honour the Idempotency-Key header of authenticated callers.
+    Goes above any transaction decorator, so a response is only replayed once its changes are committed.
+    The handler must let unexpected errors raise: a 4xx it returns for them would be replayed to every retry.
+    """
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        idempotency_key = request.META.get(HEADER)
+        if not idempotency_key or not request.user.is_authenticated:
+            return handler(self, request, *args, **kwargs)
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return Response("Idempotency-Key is too long", status=status.HTTP_400_BAD_REQUEST)
+
+        key = f"idempotency:{request.user.id}:{hashlib.sha1(idempotency_key.encode()).hexdigest()}"
+        request_fingerprint = fingerprint(request)
+        keys = get_keys()
+        deadline = time.monotonic() + getattr(settings, 'IDEMPOTENCY_WAIT', 10)
+        while True:
+            entry = keys.claim(key, request_fingerprint)
+            if entry is None:
+                break
+            if entry[0] != request_fingerprint:
+                return Response("This Idempotency-Key was sent with another request",
+                                status=status.HTTP_400_BAD_REQUEST)
+            if entry[1] is not None:
+                return _replay(entry)
+            if time.monotonic() >= deadline:
+                return Response("A request with this Idempotency-Key is still in progress",
+                                status=status.HTTP_409_CONFLICT)
+            keys.wait(key, deadline - time.monotonic())
+
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except BaseException:
+            keys.release(key)
+            raise
+        if _keeps(response):
+            keys.finish(key, (request_fingerprint, response.status_code, _plain(response.data)),
+                        getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+        else:
+            keys.release(key)
+        return response
+
+    return wrapper
@@ -0,0 +1,125 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from . import sharding
+from .models import OrderItem, Stock, StockReservation
+
+RESERVATION_TTL = getattr(settings, 'STOCK_RESERVATION_TTL', timedelta(minutes=30))
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id, requested):
+        self.product_id = product_id
+        self.requested = requested
+        super().__init__(f"Not enough stock for product {product_id}")
+
+
+def _take(product_id, quantity):
+    """Moves `quantity` units from available to reserved, only if that many are available"""
+    return Stock.objects.filter(product_id=product_id, available__gte=quantity).update(
+        available=F('available') - quantity, reserved=F('reserved') + quantity
+    )
+
+
+def _give_back(product_id, quantity):
+    Stock.objects.filter(product_id=product_id).update(
+        available=F('available') + quantity, reserved=F('reserved') - quantity
+    )
+
+
+def is_tracked(product_id):
+    return Stock.objects.filter(product_id=product_id).exists()
+
+
+def reserve(order, product, quantity):
+    """
+    Holds `quantity` units of `product` for the pending `order`, replacing any previous hold.
+    Untracked products are never held.
+    :raises OutOfStock: when the extra units aren't available
+    """
+    if not is_tracked(product.id):
+        return
+    expires_on = timezone.now() + RESERVATION_TTL
+    # the reservation lives next to its order, the stock in `default`
+    with sharding.atomic(order._state.db):
+        reservation = StockReservation.objects.using(order._state.db).select_for_update().filter(
+            order=order, product=product
+        ).first()
+        held = reservation.quantity if reservation else 0
+        delta = quantity - held
+        if delta > 0 and not _take(product.id, delta):
+            raise OutOfStock(product.id, quantity)
+        if delta < 0:
+            _give_back(product.id, -delta)
+
+        if reservation:
+            reservation.quantity = quantity
+            reservation.expires_on = expires_on
+            reservation.save(update_fields=['quantity', 'expires_on'])
+        else:
+            StockReservation.objects.using(order._state.db).create(
+                order=order, product=product, quantity=quantity, expires_on=expires_on
+            )
+
+
+def release(reservations):
+    """Returns the units of `reservations` to available stock, one UPDATE per product"""
+    alias = sharding.shard_of(reservations)
+    with sharding.atomic(alias):
+        held = defaultdict(int)
+        ids = []
+        for reservation_id, product_id, quantity in reservations.select_for_update().values_list(
+                'id', 'product_id', 'quantity'):
+            held[product_id] += quantity
+            ids.append(reservation_id)
+        for product_id, quantity in held.items():
+            if quantity:
+                _give_back(product_id, quantity)
+        StockReservation.objects.using(alias).filter(id__in=ids).delete()
+    return len(ids)
+
+
+def release_expired(now=None):
+    expired = StockReservation.objects.filter(expires_on__lt=now or timezone.now(), order__status='Pending')
+    return sum(release(reservations) for reservations in sharding.scatter(expired))
+
+
+def _tracked_quantities(order_items):
+    """{product id: units} of the items whose product has tracked stock"""
+    quantities = defaultdict(int)
+    for product_id, quantity in order_items.exclude(product=None).values_list('product_id', 'quantity'):
+        quantities[product_id] += quantity
+    # stock lives in `default` with the products, the items possibly in a shard, so no join
+    tracked = set(Stock.objects.filter(product_id__in=quantities.keys()).values_list('product_id', flat=True))
+    return {product_id: quantity for product_id, quantity in quantities.items() if product_id in tracked}
+
+
+def commit_order(order_id):
+    """
+    Turns the holds of a pending order into sold units. Items whose hold expired are taken again,
+    so this fails only when the missing units are no longer available.
+    :raises OutOfStock: nothing is changed in that case
+    """
+    with sharding.atomic():
+        held = dict(StockReservation.objects.filter(order_id=order_id).values_list('product_id', 'quantity'))
+        wanted = defaultdict(int, _tracked_quantities(OrderItem.objects.filter(order_id=order_id)))
+
+        for product_id in held.keys() | wanted.keys():
+            delta = wanted[product_id] - held.get(product_id, 0)
+            if delta > 0 and not _take(product_id, delta):
+                raise OutOfStock(product_id, wanted[product_id])
+            if delta < 0:
+                _give_back(product_id, -delta)
+            if wanted[product_id]:
+                Stock.objects.filter(product_id=product_id).update(reserved=F('reserved') - wanted[product_id])
+        StockReservation.objects.filter(order_id=order_id).delete()
+
+
+def restock_orders(order_ids):
+    """Puts the units of already committed orders back on the shelf"""
+    for product_id, quantity in _tracked_quantities(OrderItem.objects.filter(order_id__in=order_ids)).items():
+        Stock.objects.filter(product_id=product_id).update(available=F('available') + quantity)
@@ -0,0 +1,136 @@
+"""
+Bestseller leaderboards.
+
+Every product with sales has one Bestseller row per scope it belongs to (global, its shop, its category)
+and per time window. Rows are incremented as orders complete, and the (scope, window, -units) index
+hands back the top N of any leaderboard by reading N index entries.
+
+Sales are dated by the day their order completed, not the day its cart was opened (see sales.daily_buckets).
+They age out of the 7 and 30 day windows without any order changing, so those windows are recomputed
+from the DailySales rollups by `manage.py refresh_bestsellers`, once a day.
+"""
+import datetime
+
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from .models import Bestseller, DailySales, OrderItem
+from .sales import daily_buckets
+
+# window -> number of days it covers, None for all time
+WINDOWS = {
+    '7d': 7,
+    '30d': 30,
+    'all': None,
+}
+
+
+def global_scope():
+    return 'global'
+
+
+def shop_scope(shop_id):
+    return f"shop:{shop_id}"
+
+
+def category_scope(category):
+    return f"category:{category}"
+
+
+def product_scopes(shop_id, category):
+    return [global_scope(), shop_scope(shop_id), category_scope(category)]
+
+
+def window_start(window, today=None):
+    """First day counted by `window`, None for all time"""
+    days = WINDOWS[window]
+    if days is None:
+        return None
+    return (today or timezone.localdate()) - datetime.timedelta(days=days - 1)
+
+
+def top_sellers(scope, window='all', limit=10):
+    """The `limit` best selling products of a leaderboard, most units first"""
+    return Bestseller.objects.filter(scope=scope, window=window, units__gt=0).order_by('-units', 'product_id')[:limit]
+
+
+def shop_top_sellers(shop, limit=5):
+    """
+    The all time top of `shop` as {'product__name', 'total_quantity'} dicts. Sales completed before the
+    leaderboards existed only show up once `backfill_daily_sales` and `refresh_bestsellers --all` have run.
+    """
+    return list(top_sellers(shop_scope(shop.id), limit=limit).values(
+        'product__name', total_quantity=models.F('units')
+    ))
+
+
+def _add(scope, window, product_id, units, revenue):
+    lookup = {'scope': scope, 'window': window, 'product_id': product_id}
+    increments = {
+        'units': models.F('units') + units,
+        'revenue': models.F('revenue') + revenue,
+    }
+    if Bestseller.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            Bestseller.objects.create(units=units, revenue=revenue, **lookup)
+    except IntegrityError:
+        # another worker created the row in the meantime
+        Bestseller.objects.filter(**lookup).update(**increments)
+
+
+def add_orders(order_ids):
+    """Adds freshly completed orders to every leaderboard and window their products and completion days fall in"""
+    starts = {window: window_start(window) for window in WINDOWS}
+    totals = {}
+    for bucket in daily_buckets(OrderItem.objects.filter(order_id__in=order_ids)):
+        for window, start in starts.items():
+            if start is not None and bucket['date'] < start:
+                continue
+            key = (window, bucket['product_id'])
+            if key not in totals:
+                totals[key] = [product_scopes(bucket['product__shop_id'], bucket['product__category']), 0, 0]
+            totals[key][1] += bucket['units']
+            totals[key][2] += bucket['revenue']
+
+    with transaction.atomic():
+        for (window, product_id), (scopes, units, revenue) in totals.items():
+            for scope in scopes:
+                _add(scope, window, product_id, units, revenue)
+
+
+def move_category(product_id, previous, category):
+    """Moves the category leaderboard rows of a product whose category changed to its new category"""
+    with transaction.atomic():
+        rows = Bestseller.objects.select_for_update().filter(scope=category_scope(previous), product_id=product_id)
+        for row in rows:
+            _add(category_scope(category), row.window, product_id, row.units, row.revenue)
+        rows.delete()
+
+
+def rebuild_leaderboards(windows=None, batch_size=1000):
+    """
+    Recomputes the leaderboards of `windows` (all of them by default) from the daily sales rollups
+    :return: number of leaderboard rows written
+    """
+    windows = windows or list(WINDOWS)
+    rows = []
+    for window in windows:
+        rollups = DailySales.objects.all()
+        start = window_start(window)
+        if start is not None:
+            rollups = rollups.filter(date__gte=start)
+        for total in rollups.values('product_id', 'product__shop_id', 'product__category').annotate(
+            units=models.Sum('units'),
+            revenue=models.Sum('revenue'),
+        ).order_by().iterator():
+            rows += [
+                Bestseller(scope=scope, window=window, product_id=total['product_id'],
+                           units=total['units'], revenue=total['revenue'])
+                for scope in product_scopes(total['product__shop_id'], total['product__category'])
+            ]
+    with transaction.atomic():
+        Bestseller.objects.filter(window__in=windows).delete()
+        Bestseller.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
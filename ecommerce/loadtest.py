@@ -0,0 +1,334 @@
+"""
+Synthetic load for capacity planning, driven by `manage.py loadtest`.
+
+`seed` creates shops, products and customers through the ORM. Each concurrent client then plays
+customer journeys picked by weight from JOURNEYS, either through Django's test client in this process
+or over HTTP against a running server that uses the same database. Every request is recorded under
+its URL name, and `report` turns the records into a JSON document meant to be diffed between commits.
+"""
+import http.client
+import json
+import random
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import sharding
+from .models import PRODUCT_CATEGORIES, Order, Product, Shop, Stock, User
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Fixture:
+    """Rows created by `seed`, all named after `run` so `delete` finds them again"""
+
+    def __init__(self, run, owners, shops, products, customers):
+        self.run = run
+        self.owners = owners
+        self.shops = shops
+        self.products = products
+        self.customers = customers
+        self.owner_of = {shop.id: owner for shop, owner in zip(shops, owners)}
+        self.shop_of = {product.id: product.shop_id for product in products}
+
+    def delete(self):
+        users = [user.id for user in self.owners + self.customers]
+        for orders in sharding.scatter(Order.objects.filter(customer_id__in=users)):
+            orders.delete()
+        Shop.objects.filter(id__in=[shop.id for shop in self.shops]).delete()
+        User.objects.filter(id__in=users).delete()
+
+
+def seed(shops=5, products=200, customers=50, stock=None):
+    """
+    Creates `shops` shops sharing `products` products and `customers` customers.
+    Products get `stock` units of tracked stock, or none at all (untracked) when it's None.
+    """
+    run = uuid.uuid4().hex[:8]
+    User.objects.bulk_create(
+        [User(username=f"load-{run}-owner-{i}", email=f"load-{run}-owner-{i}@load.local") for i in range(shops)] +
+        [User(username=f"load-{run}-{i}", email=f"load-{run}-{i}@load.local") for i in range(customers)]
+    )
+    owners = list(User.objects.filter(username__startswith=f"load-{run}-owner-").order_by('id'))
+    Shop.objects.bulk_create([
+        Shop(shop_uuid=str(uuid.uuid4()), name=f"load {run} {i}", address='-', phone_number='-', owner=owner)
+        for i, owner in enumerate(owners)
+    ])
+    shop_list = list(Shop.objects.filter(owner__in=owners).order_by('id'))
+    categories = [category for category, _ in PRODUCT_CATEGORIES]
+    Product.objects.bulk_create([
+        Product(product_uuid=str(uuid.uuid4()), name=f"load {run} product {i}",
+                price=random.randint(100, 10000) / 100, category=categories[i % len(categories)],
+                description='load test product ' * 5, shop=shop_list[i % len(shop_list)])
+        for i in range(products)
+    ])
+    product_list = list(Product.objects.filter(shop__in=shop_list))
+    if stock is not None:
+        Stock.objects.bulk_create([Stock(product=product, available=stock) for product in product_list])
+    customer_list = list(
+        User.objects.filter(username__startswith=f"load-{run}-").exclude(username__startswith=f"load-{run}-owner-")
+    )
+    return Fixture(run, owners, shop_list, product_list, customer_list)
+
+
+class TestClient:
+    """Django's test client in this process, authenticated as `user`"""
+
+    def __init__(self, user):
+        # errors come back as 500 responses, like from a server
+        self.client = APIClient(raise_request_exception=False)
+        self.client.force_authenticate(user)
+
+    def request(self, method, path, data=None):
+        response = getattr(self.client, method.lower())(path, data, format='json')
+        return response.status_code, getattr(response, 'data', None)
+
+    def close(self):
+        connection.close()
+
+
+class HttpClient:
+    """One keep-alive connection to a running server, authenticated as `user` with a fresh JWT"""
+
+    def __init__(self, user, base_url):
+        url = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(url.netloc, timeout=30)
+        self.headers = {
+            'Authorization': f"Bearer {RefreshToken.for_user(user).access_token}",
+            'Content-Type': 'application/json',
+        }
+
+    def request(self, method, path, data=None):
+        body = json.dumps(data) if data is not None else None
+        try:
+            self.connection.request(method, path, body=body, headers=self.headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            # the server dropped the connection, reconnect on the next request
+            self.connection.close()
+            raise
+        try:
+            return response.status, json.loads(content) if content else None
+        except ValueError:
+            return response.status, None
+
+    def close(self):
+        self.connection.close()
+
+
+class Recorder:
+    """Collects (URL name, status, seconds) of every request, shared by all clients"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = []
+        self.journeys = []
+
+    def add(self, name, status, seconds):
+        with self.lock:
+            self.records.append((name, status, seconds))
+
+    def add_journey(self, name, seconds, ok):
+        with self.lock:
+            self.journeys.append((name, seconds, ok))
+
+
+class Session:
+    """One simulated customer: a client, the fixture and the recorder"""
+
+    def __init__(self, client, owner_clients, fixture, recorder):
+        self.client = client
+        self.owner_clients = owner_clients
+        self.fixture = fixture
+        self.recorder = recorder
+
+    def call(self, client, method, name, data=None, query='', **kwargs):
+        started = time.perf_counter()
+        try:
+            status, body = client.request(method, reverse(name, kwargs=kwargs or None) + query, data)
+        except (OSError, http.client.HTTPException):
+            status, body = 0, None
+        self.recorder.add(name, status, time.perf_counter() - started)
+        return status, body
+
+    def product(self):
+        return random.choice(self.fixture.products)
+
+    # journeys, each returns True when every step succeeded
+
+    def browse(self):
+        category = random.choice(PRODUCT_CATEGORIES)[0]
+        first_page, _ = self.call(self.client, 'GET', 'product-list')
+        filtered, _ = self.call(self.client, 'GET', 'product-list', query='?' + urlencode({'category': category}))
+        return first_page < 400 and filtered < 400
+
+    def view_product(self):
+        status, _ = self.call(self.client, 'GET', 'product', product_uuid=self.product().product_uuid)
+        return status < 400
+
+    def add_to_cart(self):
+        return all(
+            self.call(self.client, 'GET', 'add-to-cart', product_uuid=self.product().product_uuid)[0] < 400
+            for _ in range(random.randint(1, 3))
+        )
+
+    def view_cart(self):
+        return self.call(self.client, 'GET', 'order-confirm')[0] < 400
+
+    def checkout(self):
+        product = self.product()
+        if self.call(self.client, 'GET', 'add-to-cart', product_uuid=product.product_uuid)[0] >= 400:
+            return False
+        status, cart = self.call(self.client, 'GET', 'order-confirm')
+        if status >= 400 or not cart:
+            return False
+        order_uuid = cart['order']['order_uuid']
+        if self.call(self.client, 'PUT', 'order-update', order_uuid=order_uuid)[0] >= 400:
+            return False
+        # earlier journeys may have filled the cart from other shops, each ships its part
+        completed = False
+        for shop_id in {self.fixture.shop_of[item['product']] for item in cart['order_items'] if item['product']}:
+            status, body = self.call(self.owner_clients[shop_id], 'POST', 'shop-order-transition',
+                                     {'order_uuids': [order_uuid], 'status': 'Completed'})
+            if status >= 400 or not body:
+                return False
+            completed = completed or order_uuid in body['order_uuids']
+        # a 200 may still have skipped the order, it only counts once the order completed
+        return completed
+
+    def review(self):
+        review = {'text': 'load test review', 'ratings': random.randint(1, 5)}
+        status, _ = self.call(self.client, 'POST', 'reviews', review, product_uuid=self.product().product_uuid)
+        return status < 400
+
+
+# journey -> default weight
+JOURNEYS = {
+    'browse': 40,
+    'view_product': 30,
+    'add_to_cart': 10,
+    'view_cart': 8,
+    'checkout': 7,
+    'review': 5,
+}
+
+
+def run(fixture, clients=4, duration=10.0, journeys=None, mix=None, target=None):
+    """
+    Plays weighted journeys from `clients` threads until `duration` seconds passed or
+    `journeys` journeys were played, whichever comes first.
+    `target` is a base URL like http://127.0.0.1:8000, None uses the test client.
+    :return: (Recorder, elapsed seconds)
+    """
+    mix = mix or JOURNEYS
+    names, weights = list(mix), list(mix.values())
+    recorder = Recorder()
+    remaining = [journeys]
+    lock = threading.Lock()
+
+    def make_client(user):
+        return HttpClient(user, target) if target else TestClient(user)
+
+    def play(customer):
+        client = make_client(customer)
+        owner_clients = {shop.id: make_client(fixture.owner_of[shop.id]) for shop in fixture.shops}
+        session = Session(client, owner_clients, fixture, recorder)
+        deadline = time.perf_counter() + duration
+        try:
+            while time.perf_counter() < deadline:
+                if remaining[0] is not None:
+                    with lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                name = random.choices(names, weights)[0]
+                started = time.perf_counter()
+                ok = getattr(session, name)()
+                recorder.add_journey(name, time.perf_counter() - started, ok)
+        finally:
+            for opened in [client] + list(owner_clients.values()):
+                opened.close()
+
+    customers = [fixture.customers[i % len(fixture.customers)] for i in range(clients)]
+    threads = [threading.Thread(target=play, args=(customer,)) for customer in customers]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - started
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(percent / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(seconds, errors, elapsed):
+    seconds = sorted(seconds)
+    summary = {
+        'count': len(seconds),
+        'errors': errors,
+        'error_rate': round(errors / len(seconds), 4) if seconds else 0.0,
+        'throughput_per_s': round(len(seconds) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'mean': round(statistics.fmean(seconds) * 1000, 3) if seconds else None,
+            'max': round(seconds[-1] * 1000, 3) if seconds else None,
+        },
+    }
+    for percent in PERCENTILES:
+        value = percentile(seconds, percent)
+        summary['latency_ms'][f"p{percent}"] = round(value * 1000, 3) if value is not None else None
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(recorder, elapsed, **meta):
+    """
+    Machine readable results: overall, per URL name and per journey.
+    Statuses of 400 and above, and failed connections (status 0), count as errors.
+    """
+    by_endpoint, statuses = {}, {}
+    for name, status, seconds in recorder.records:
+        by_endpoint.setdefault(name, []).append((status, seconds))
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    by_journey = {}
+    for name, seconds, ok in recorder.journeys:
+        by_journey.setdefault(name, []).append((ok, seconds))
+
+    return {
+        'meta': {'commit': git_commit(), 'database': connection.vendor, 'elapsed_s': round(elapsed, 3), **meta},
+        'requests': summarize([seconds for _, _, seconds in recorder.records],
+                              sum(1 for _, status, _ in recorder.records if status == 0 or status >= 400), elapsed),
+        'statuses': statuses,
+        'endpoints': {
+            name: summarize([seconds for _, seconds in rows],
+                            sum(1 for status, _ in rows if status == 0 or status >= 400), elapsed)
+            for name, rows in sorted(by_endpoint.items())
+        },
+        'journeys': {
+            name: summarize([seconds for _, seconds in rows], sum(1 for ok, _ in rows if not ok), elapsed)
+            for name, rows in sorted(by_journey.items())
+        },
+    }
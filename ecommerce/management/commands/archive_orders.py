@@ -0,0 +1,46 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ecommerce import sharding
+from ecommerce.archive import archivable_orders, archive_orders
+
+
+class Command(BaseCommand):
+    help = "Moves old completed orders into the archive tables in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float,
+                            help="Age in days after which a completed order is archived, "
+                                 "defaults to settings.ORDER_ARCHIVE_AGE")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Count the orders without moving them")
+
+    def handle(self, *args, **options):
+        if options['days'] is not None:
+            max_age = timedelta(days=options['days'])
+        else:
+            max_age = getattr(settings, 'ORDER_ARCHIVE_AGE', timedelta(days=90))
+        orders = archivable_orders(timezone.now() - max_age)
+
+        if options['dry_run']:
+            count = sum(shard_orders.count() for shard_orders in sharding.scatter(orders))
+            self.stdout.write(f"{count} orders to archive")
+            return
+
+        archived = batches = 0
+        started = time.perf_counter()
+        for shard_orders in sharding.scatter(orders):
+            for count in archive_orders(shard_orders, batch_size=options['batch_size']):
+                archived += count
+                batches += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"batch {batches}: {count} orders")
+        elapsed = time.perf_counter() - started
+        rate = archived / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} completed orders in {batches} batches, {elapsed:.2f}s ({rate:.0f} orders/s)"
+        ))
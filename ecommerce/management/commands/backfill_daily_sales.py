@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.sales import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily sales rollups from completed orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day to rebuild (YYYY-MM-DD), defaults to the whole history")
+        parser.add_argument('--end', help="Last day to rebuild (YYYY-MM-DD), defaults to today")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_daily_sales(start=options['start'], end=options['end'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily sales rows"))
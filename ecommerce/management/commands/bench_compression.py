@@ -0,0 +1,55 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from ecommerce.middleware import brotli
+from ecommerce.models import Product, Review, Shop, User
+
+
+class Command(BaseCommand):
+    help = "Measures bytes on the wire and latency of large catalog and analytics responses per encoding"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100)
+        parser.add_argument('--reviews', type=int, default=500)
+        parser.add_argument('--rounds', type=int, default=50)
+
+    def handle(self, *args, **options):
+        encodings = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+
+        # the fixture rows are rolled back at the end
+        with transaction.atomic():
+            run = uuid.uuid4().hex[:8]
+            owner = User.objects.create(username=f"bench-{run}", email=f"bench-{run}@bench.local")
+            shop = Shop.objects.create(shop_uuid=str(uuid.uuid4()), name='bench', address='-', phone_number='-',
+                                       owner=owner)
+            Product.objects.bulk_create([
+                Product(product_uuid=str(uuid.uuid4()), name=f"bench product {i}", price=i + 0.99,
+                        category='Books', description='lorem ipsum dolor sit amet ' * 10, shop=shop)
+                for i in range(options['products'])
+            ])
+            product = Product.objects.filter(shop=shop).first()
+            Review.objects.bulk_create([
+                Review(review_uuid=str(uuid.uuid4()), user=owner, product=product, text='great value ' * 10,
+                       ratings=i % 5)
+                for i in range(options['reviews'])
+            ])
+
+            client = APIClient()
+            client.force_authenticate(owner)
+            endpoints = {
+                'catalog': f"/api/product/v1/products/?page_size={options['products']}",
+                'analytics': '/api/shop/v1/shop-analytics/',
+            }
+            for name, url in endpoints.items():
+                for encoding in encodings:
+                    started = time.perf_counter()
+                    for _ in range(options['rounds']):
+                        response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+                    elapsed = (time.perf_counter() - started) / options['rounds']
+                    self.stdout.write(f"{name} {encoding}: {len(response.content)} bytes, "
+                                      f"{elapsed * 1000:.2f} ms per request")
+            transaction.set_rollback(True)
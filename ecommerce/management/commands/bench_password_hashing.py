@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = "Measures single-core hashes per second for every password hashing profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=2.0, help="Time spent per profile")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"active profile: {settings.PASSWORD_HASHING_PROFILE} ({get_hasher().algorithm})")
+        for profile, hashers in settings.PASSWORD_HASHING_PROFILES.items():
+            try:
+                hasher = import_string(hashers[0])()
+                hasher.encode('warm-up', hasher.salt())
+            except (ImportError, ValueError) as e:
+                self.stdout.write(f"{profile}: unavailable ({e})")
+                continue
+
+            hashes = 0
+            started = time.perf_counter()
+            while time.perf_counter() - started < options['seconds']:
+                hasher.encode('correct horse battery staple', hasher.salt())
+                hashes += 1
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{profile}: {hashes / elapsed:.1f} hashes/s per core "
+                              f"({elapsed / hashes * 1000:.1f} ms each)")
@@ -0,0 +1,60 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from ecommerce.fast_serializers import ProductValuesSerializer
+from ecommerce.models import Product, Shop
+from ecommerce.renderers import FastJSONRenderer, orjson
+from ecommerce.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    help = "Compares per-item serialize + render cost of ProductSerializer and the values() fast path"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100, help="Products per page")
+        parser.add_argument('--rounds', type=int, default=200)
+
+    def handle(self, *args, **options):
+        items, rounds = options['items'], options['rounds']
+        request = APIRequestFactory().get('/api/product/v1/products/')
+
+        # the fixture products are rolled back at the end
+        with transaction.atomic():
+            shop = Shop.objects.create(shop_uuid=str(uuid.uuid4()), name='bench', address='-', phone_number='-')
+            Product.objects.bulk_create([
+                Product(product_uuid=str(uuid.uuid4()), name=f"bench product {i}", price=i + 0.99,
+                        category='Books', description='lorem ipsum ' * 20, shop=shop)
+                for i in range(items)
+            ])
+            queryset = Product.objects.filter(shop=shop).order_by('id')
+
+            slow = JSONRenderer().render(ProductSerializer(queryset, many=True, context={'request': request}).data)
+            fast = FastJSONRenderer().render(ProductValuesSerializer(queryset, request=request).data)
+            if slow != fast:
+                raise CommandError("Fast path output differs from ProductSerializer")
+
+            results = {
+                'ProductSerializer + JSONRenderer': self.time(rounds, lambda: JSONRenderer().render(
+                    ProductSerializer(queryset.select_related('shop', 'rating'), many=True,
+                                      context={'request': request}).data
+                )),
+                'ProductValuesSerializer + FastJSONRenderer': self.time(rounds, lambda: FastJSONRenderer().render(
+                    ProductValuesSerializer(queryset, request=request).data
+                )),
+            }
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{items} items per page, {rounds} rounds, orjson {'on' if orjson else 'off'}")
+        for name, seconds in results.items():
+            self.stdout.write(f"{name}: {seconds / rounds / items * 1e6:.1f} us per item")
+
+    def time(self, rounds, render):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            render()
+        return time.perf_counter() - started
@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+STOCK_SQLITE = {'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {}}
+
+
+TUNED_SQLITE = {'ENGINE': 'ecommerce.backends.sqlite3', 'OPTIONS': settings.SQLITE_PERFORMANCE_OPTIONS}
+
+
+def _use(alias, database, path):
+    configured = connections.configure_settings({'default': {}, alias: {**database, 'NAME': path}})
+    connections.settings[alias] = configured[alias]
+    return connections[alias]
+
+
+def _writer(args):
+    """Adds `writes` items to one cart the way AddToCartView does: read the total, insert, update"""
+    alias, database, path, cart_id, writes = args
+    connections.close_all()
+    _use(alias, database, path)
+    done = locked = 0
+    for _ in range(writes):
+        try:
+            with transaction.atomic(using=alias):
+                with connections[alias].cursor() as cursor:
+                    cursor.execute("SELECT total FROM bench_cart WHERE id = %s", [cart_id])
+                    cursor.fetchone()
+                    cursor.execute("INSERT INTO bench_item (cart_id, price) VALUES (%s, 1)", [cart_id])
+                    cursor.execute("UPDATE bench_cart SET total = total + 1 WHERE id = %s", [cart_id])
+            done += 1
+        except OperationalError:
+            locked += 1
+    connections[alias].close()
+    return done, locked
+
+
+class Command(BaseCommand):
+    help = "Compares multi-process write throughput and lock errors of stock SQLite and SQLITE_PERFORMANCE_MODE"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help="Writes per process")
+
+    def handle(self, *args, **options):
+        processes, writes = options['processes'], options['writes']
+        context = multiprocessing.get_context('fork')
+
+        for mode, database in (('stock', STOCK_SQLITE), ('tuned', TUNED_SQLITE)):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                alias = f'bench_{mode}'
+                with _use(alias, database, path).cursor() as cursor:
+                    cursor.execute("CREATE TABLE bench_cart (id INTEGER PRIMARY KEY, total INTEGER NOT NULL)")
+                    cursor.execute("CREATE TABLE bench_item (id INTEGER PRIMARY KEY, cart_id INTEGER, price INTEGER)")
+                    cursor.executemany("INSERT INTO bench_cart (id, total) VALUES (%s, 0)",
+                                       [[cart_id] for cart_id in range(processes)])
+                connections[alias].close()
+
+                started = time.perf_counter()
+                with context.Pool(processes) as pool:
+                    results = pool.map(_writer, [(alias, database, path, cart_id, writes)
+                                                 for cart_id in range(processes)])
+                elapsed = time.perf_counter() - started
+
+            done = sum(result[0] for result in results)
+            locked = sum(result[1] for result in results)
+            self.stdout.write(f"{mode}: {done} writes in {elapsed:.2f}s ({done / elapsed:.0f}/s) "
+                              f"with {processes} processes, {locked} 'database is locked' errors")
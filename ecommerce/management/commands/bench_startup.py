@@ -0,0 +1,68 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# What a process loads before it can work, run in a fresh interpreter per measurement
+TARGETS = {
+    # manage.py before running a command
+    'setup': "import django; django.setup()",
+    # a gunicorn worker before serving its first request
+    'worker': "from ecommerce_drf.wsgi import application; "
+              "from django.urls import get_resolver; get_resolver().url_patterns",
+}
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+{code}
+print(json.dumps({{'seconds': time.perf_counter() - started, 'modules': len(sys.modules),
+                  'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+
+def _run(code, *flags):
+    environment = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE',
+                                                                             'ecommerce_drf.settings')}
+    return subprocess.run([sys.executable, *flags, '-c', PROBE.format(code=code)], cwd=settings.BASE_DIR,
+                          env=environment, capture_output=True, text=True, check=True)
+
+
+def import_profile(code):
+    """Seconds spent importing each top level package, from `python -X importtime`"""
+    packages = {}
+    for line in _run(code, '-X', 'importtime').stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line.split(':', 1)[1].split('|')
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1e6
+    return packages
+
+
+class Command(BaseCommand):
+    help = "Measures the time, memory and modules it takes a fresh process to set Django up or boot a worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=10, help="Fresh processes per target")
+        parser.add_argument('--profile', type=int, default=0, metavar='N',
+                            help="Also list the N top level packages costing a worker the most import time")
+
+    def handle(self, *args, **options):
+        for target, code in TARGETS.items():
+            results = [json.loads(_run(code).stdout) for _ in range(options['runs'])]
+            seconds = sorted(result['seconds'] for result in results)
+            self.stdout.write(
+                f"{target}: median {statistics.median(seconds) * 1000:.1f} ms, min {seconds[0] * 1000:.1f} ms, "
+                f"max RSS {statistics.median(result['max_rss_kb'] for result in results) / 1024:.1f} MB, "
+                f"{results[0]['modules']} modules"
+            )
+
+        if options['profile']:
+            packages = import_profile(TARGETS['worker'])
+            for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:options['profile']]:
+                self.stdout.write(f"  {package}: {seconds * 1000:.1f} ms")
@@ -0,0 +1,84 @@
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+
+from ecommerce import inventory
+from ecommerce.models import Order, OrderItem, Product, Shop, Stock, User
+from ecommerce.order_lifecycle import transition_order
+
+
+class Command(BaseCommand):
+    help = "Runs many parallel checkouts against one hot product and checks that stock is never oversold"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=300)
+        parser.add_argument('--stock', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=32)
+        parser.add_argument('--retries', type=int, default=8)
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        shop = Shop.objects.create(shop_uuid=str(uuid.uuid4()), name=f"bench-{run}", address='-', phone_number='-')
+        product = Product.objects.create(product_uuid=str(uuid.uuid4()), name=f"bench-{run}", price=1,
+                                         category='Books', shop=shop)
+        Stock.objects.create(product=product, available=options['stock'])
+        User.objects.bulk_create([
+            User(username=f"bench-{run}-{i}", email=f"bench-{run}-{i}@bench.local")
+            for i in range(options['checkouts'])
+        ])
+        customers = list(User.objects.filter(username__startswith=f"bench-{run}-"))
+        Order.objects.bulk_create([
+            Order(order_uuid=str(uuid.uuid4()), customer=customer) for customer in customers
+        ])
+        orders = list(Order.objects.filter(customer__in=customers))
+        OrderItem.objects.bulk_create([
+            OrderItem(order_item_uuid=str(uuid.uuid4()), product=product, order=order, customer=order.customer,
+                      item_price=1)
+            for order in orders
+        ])
+
+        retries = []
+
+        def checkout(order):
+            try:
+                # lock errors are retried the way a client would, only exhausted retries count as errors
+                for attempt in range(options['retries'] + 1):
+                    try:
+                        transition_order(order, 'Processing')
+                        return 'placed'
+                    except inventory.OutOfStock:
+                        return 'out_of_stock'
+                    except DatabaseError:
+                        retries.append(order.id)
+                        time.sleep(0.01 * 2 ** attempt * random.random())
+                return 'error'
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = list(pool.map(checkout, orders))
+        elapsed = time.perf_counter() - started
+
+        stock = Stock.objects.get(product=product)
+        placed = results.count('placed')
+        sold = Order.objects.filter(customer__in=customers, status='Processing').count()
+        oversold = max(sold - options['stock'], 0)
+
+        self.stdout.write(f"checkouts: {len(orders)} with {options['workers']} workers in {elapsed:.2f}s "
+                          f"({len(orders) / elapsed:.1f}/s)")
+        self.stdout.write(f"placed: {placed}, out of stock: {results.count('out_of_stock')}, "
+                          f"errors: {results.count('error')}, retried lock errors: {len(retries)}")
+        self.stdout.write(f"stock left: {stock.available} available, {stock.reserved} reserved")
+        if oversold or stock.available != options['stock'] - sold:
+            self.stdout.write(self.style.ERROR(f"OVERSOLD by {oversold} units"))
+        else:
+            self.stdout.write(self.style.SUCCESS("no oversells"))
+
+        Order.objects.filter(customer__in=customers).delete()
+        User.objects.filter(id__in=[customer.id for customer in customers]).delete()
+        shop.delete()
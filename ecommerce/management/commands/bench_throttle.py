@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ecommerce.throttling import TokenBucketThrottle
+
+
+class CatalogView:
+    throttle_scope = 'catalog'
+
+
+class Command(BaseCommand):
+    help = "Measures the per-request overhead of TokenBucketThrottle with local and cache-backed buckets"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200000)
+        parser.add_argument('--clients', type=int, default=100, help="Distinct client IPs")
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        requests = [Request(factory.get('/', REMOTE_ADDR=f"10.0.{i // 256}.{i % 256}"))
+                    for i in range(options['clients'])]
+        view = CatalogView()
+
+        for backend, cache in (('local', None), ('cache', 'default')):
+            with override_settings(THROTTLE_CACHE=cache):
+                throttle = TokenBucketThrottle()
+                allowed = 0
+                started = time.perf_counter()
+                for i in range(options['requests']):
+                    allowed += throttle.allow_request(requests[i % len(requests)], view)
+                elapsed = time.perf_counter() - started
+            self.stdout.write(f"{backend}: {elapsed / options['requests'] * 1e6:.2f} us per request, "
+                              f"{allowed} of {options['requests']} allowed")
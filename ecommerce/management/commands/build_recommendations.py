@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ecommerce.recommendations import rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the co-purchase matrix and the top-K recommendations from completed orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        products = rebuild_recommendations(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Built recommendations for {products} products in {time.perf_counter() - started:.2f}s"
+        ))
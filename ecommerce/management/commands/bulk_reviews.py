@@ -0,0 +1,82 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ecommerce.models import Shop
+from ecommerce.reviews import bulk_create_reviews, bulk_delete_reviews, shop_reviews
+from ecommerce.serializers import BulkReviewSerializer
+
+
+class Command(BaseCommand):
+    help = "Imports reviews of a shop's products from a file, or deletes them in bulk, in batches"
+
+    def add_arguments(self, parser):
+        actions = parser.add_subparsers(dest='action', required=True)
+
+        imports = actions.add_parser('import', help="Create reviews from a JSON array or JSON lines file of "
+                                                    "{product_uuid, text, ratings, review_uuid (optional)}")
+        imports.add_argument('file')
+        imports.add_argument('--shop', required=True, help="shop_uuid the reviewed products belong to")
+        imports.add_argument('--batch-size', type=int, default=1000)
+
+        deletes = actions.add_parser('delete', help="Delete the shop's reviews matching every filter given")
+        deletes.add_argument('--shop', required=True, help="shop_uuid of the reviewed products")
+        deletes.add_argument('--review-uuids', help="File with one review_uuid per line")
+        deletes.add_argument('--product', help="product_uuid")
+        deletes.add_argument('--username', help="Author's username")
+        deletes.add_argument('--contains', help="Text the review contains, case insensitive")
+        deletes.add_argument('--batch-size', type=int, default=1000)
+        deletes.add_argument('--dry-run', action='store_true', help="Count the matching reviews without deleting")
+
+    def handle(self, *args, **options):
+        try:
+            shop = Shop.objects.get(shop_uuid=options['shop'])
+        except Shop.DoesNotExist:
+            raise CommandError(f"No shop '{options['shop']}'")
+        getattr(self, f"handle_{options['action']}")(shop, options)
+
+    def handle_import(self, shop, options):
+        with open(options['file']) as file:
+            content = file.read().strip()
+        if content.startswith('['):
+            rows = json.loads(content)
+        else:
+            rows = [json.loads(line) for line in content.splitlines() if line.strip()]
+
+        serializer = BulkReviewSerializer(data=rows, many=True)
+        if not serializer.is_valid():
+            invalid = [(index, errors) for index, errors in enumerate(serializer.errors) if errors]
+            for index, errors in invalid[:20]:
+                self.stderr.write(f"row {index}: {errors}")
+            raise CommandError(f"{len(invalid)} invalid rows, nothing imported")
+
+        started = time.perf_counter()
+        created, errors = bulk_create_reviews(shop, serializer.validated_data, batch_size=options['batch_size'])
+        for error in errors[:20]:
+            self.stderr.write(f"row {error['index']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} reviews, skipped {len(rows) - created - len(errors)} already imported, "
+            f"{len(errors)} errors, in {time.perf_counter() - started:.2f}s"
+        ))
+
+    def handle_delete(self, shop, options):
+        filters = {
+            key: options[key] for key in ('product', 'username', 'contains') if options[key] is not None
+        }
+        if 'product' in filters:
+            filters['product_uuid'] = filters.pop('product')
+        if options['review_uuids']:
+            with open(options['review_uuids']) as file:
+                filters['review_uuids'] = [line.strip() for line in file if line.strip()]
+        if not filters:
+            raise CommandError("Pick the reviews to delete with at least one filter")
+
+        reviews = shop_reviews(shop, **filters)
+        if options['dry_run']:
+            self.stdout.write(f"{reviews.count()} matching reviews")
+            return
+
+        started = time.perf_counter()
+        deleted = sum(bulk_delete_reviews(reviews, batch_size=options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} reviews in {time.perf_counter() - started:.2f}s"))
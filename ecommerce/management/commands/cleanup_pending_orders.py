@@ -0,0 +1,47 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ecommerce import sharding
+from ecommerce.order_lifecycle import delete_pending_orders, stale_pending_orders
+
+
+class Command(BaseCommand):
+    help = "Deletes abandoned pending orders in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float,
+                            help="Age in days after which a pending order is stale, "
+                                 "defaults to settings.STALE_PENDING_ORDER_AGE")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--empty-only', action='store_true', help="Only delete pending orders without items")
+        parser.add_argument('--dry-run', action='store_true', help="Count the stale orders without deleting")
+
+    def handle(self, *args, **options):
+        if options['days'] is not None:
+            max_age = timedelta(days=options['days'])
+        else:
+            max_age = getattr(settings, 'STALE_PENDING_ORDER_AGE', timedelta(days=30))
+        orders = stale_pending_orders(timezone.now() - max_age, empty_only=options['empty_only'])
+
+        if options['dry_run']:
+            count = sum(shard_orders.count() for shard_orders in sharding.scatter(orders))
+            self.stdout.write(f"{count} stale pending orders")
+            return
+
+        deleted = batches = 0
+        started = time.perf_counter()
+        for shard_orders in sharding.scatter(orders):
+            for count in delete_pending_orders(shard_orders, batch_size=options['batch_size']):
+                deleted += count
+                batches += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"batch {batches}: {count} orders")
+        elapsed = time.perf_counter() - started
+        rate = deleted / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} stale pending orders in {batches} batches, {elapsed:.2f}s ({rate:.0f} orders/s)"
+        ))
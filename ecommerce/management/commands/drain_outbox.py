@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ecommerce.outbox import drain, purge
+
+
+class Command(BaseCommand):
+    help = "Hands pending outbox events to their handlers in batches, then purges old processed events"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Events per batch, defaults to OUTBOX_BATCH_SIZE")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new events instead of exiting")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls when idle")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = retried = 0
+            while True:
+                events, retries = drain(batch_size=options['batch_size'])
+                if not events:
+                    break
+                processed += events
+                retried += retries
+                if retries:
+                    # failed handlers get their next attempt on the next poll, not straight away
+                    break
+            if processed:
+                self.stdout.write(f"Processed {processed} events, {retried} queued for a retry")
+
+            purged = purge()
+            if purged:
+                self.stdout.write(f"Purged {purged} processed events")
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS("Outbox drained"))
@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ecommerce.schema import render_json
+
+
+class Command(BaseCommand):
+    help = "Writes the OpenAPI schema to OPENAPI_SCHEMA_FILE, which /docs.json/ then serves as is"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help="Defaults to OPENAPI_SCHEMA_FILE")
+
+    def handle(self, *args, **options):
+        output = options['output'] or settings.OPENAPI_SCHEMA_FILE
+        started = time.perf_counter()
+        schema = render_json()
+        with open(output, 'wb') as schema_file:
+            schema_file.write(schema)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(schema)} bytes of schema to {output} in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,74 @@
+import json
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from ecommerce import loadtest
+
+
+class Command(BaseCommand):
+    help = ("Seeds shops, products and customers, plays a weighted mix of customer journeys from concurrent clients "
+            "and reports throughput, latency percentiles and error rates as JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', help="Base URL of a running server using this database, "
+                                             "e.g. http://127.0.0.1:8000. Defaults to Django's test client")
+        parser.add_argument('--clients', type=int, default=4, help="Concurrent clients, one customer each")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds to run")
+        parser.add_argument('--journeys', type=int, help="Stop after this many journeys, before --duration if sooner")
+        parser.add_argument('--mix', help="Journey weights, e.g. browse=40,view_product=30,checkout=30. "
+                                          f"Defaults to {','.join(f'{k}={v}' for k, v in loadtest.JOURNEYS.items())}")
+        parser.add_argument('--shops', type=int, default=5)
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--customers', type=int, default=50)
+        parser.add_argument('--stock', type=int, help="Units of tracked stock per product, untracked by default")
+        parser.add_argument('--seed', type=int, help="Random seed, for the same journey mix between runs")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded rows instead of deleting them")
+        parser.add_argument('--throttle', action='store_true',
+                            help="Keep the API throttles on with the test client, a --target server applies its own")
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix']) if options['mix'] else None
+        if options['seed'] is not None:
+            loadtest.random.seed(options['seed'])
+
+        fixture = loadtest.seed(shops=options['shops'], products=options['products'],
+                                customers=max(options['customers'], options['clients']), stock=options['stock'])
+        # every client is one customer, so per-user throttles would measure the throttle rates, not capacity
+        unthrottled = override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}})
+        try:
+            with nullcontext() if options['target'] or options['throttle'] else unthrottled:
+                recorder, elapsed = loadtest.run(fixture, clients=options['clients'], duration=options['duration'],
+                                                 journeys=options['journeys'], mix=mix, target=options['target'])
+        finally:
+            if not options['keep']:
+                fixture.delete()
+
+        report = loadtest.report(
+            recorder, elapsed, target=options['target'] or 'test client', clients=options['clients'],
+            mix=mix or loadtest.JOURNEYS, products=options['products'], stock=options['stock'],
+        )
+        document = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(document + '\n')
+            requests = report['requests']
+            self.stdout.write(self.style.SUCCESS(
+                f"{requests['count']} requests, {requests['throughput_per_s']}/s, "
+                f"p95 {requests['latency_ms']['p95']} ms, error rate {requests['error_rate']}, "
+                f"report written to {options['output']}"
+            ))
+        else:
+            self.stdout.write(document)
+
+    def parse_mix(self, value):
+        mix = {}
+        for part in value.split(','):
+            name, _, weight = part.partition('=')
+            if name not in loadtest.JOURNEYS or not weight.isdigit():
+                raise CommandError(f"Invalid journey weight '{part}', journeys are {', '.join(loadtest.JOURNEYS)}")
+            mix[name] = int(weight)
+        return mix
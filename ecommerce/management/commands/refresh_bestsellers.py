@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.leaderboards import WINDOWS, rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = ("Recomputes the 7 and 30 day bestseller leaderboards from the daily sales rollups, "
+            "run it once a day so old sales leave the windows")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Also rebuild the all-time leaderboards, e.g. after `backfill_daily_sales`")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        windows = list(WINDOWS) if options['all'] else [window for window, days in WINDOWS.items() if days]
+        written = rebuild_leaderboards(windows, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} leaderboard rows for {', '.join(windows)}"))
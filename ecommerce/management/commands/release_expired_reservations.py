@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.inventory import release_expired
+
+
+class Command(BaseCommand):
+    help = "Returns stock held by abandoned carts whose reservation expired"
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservations"))
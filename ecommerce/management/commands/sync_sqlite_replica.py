@@ -0,0 +1,21 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Copies the SQLite primary database into the SQLite replicas, for trying the replica setup locally"
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replica configured, set REPLICA_DATABASE")
+
+        for alias in settings.DATABASE_REPLICAS:
+            replica = settings.DATABASES[alias]
+            if 'sqlite3' not in primary['ENGINE'] or 'sqlite3' not in replica['ENGINE']:
+                raise CommandError("Only SQLite databases can be synced with this command")
+            with sqlite3.connect(primary['NAME']) as source, sqlite3.connect(replica['NAME']) as target:
+                source.backup(target)
+            self.stdout.write(self.style.SUCCESS(f"Copied {primary['NAME']} to {replica['NAME']}"))
@@ -0,0 +1,201 @@
+"""
+Operational metrics in the Prometheus text exposition format.
+
+Each process keeps its counters and histograms in memory. With METRICS_DIR set, every process also
+writes a snapshot of them there at most every METRICS_FLUSH_INTERVAL seconds, and the metrics endpoint
+adds up the snapshots of all processes, so any gunicorn worker answers for the whole server.
+Clear METRICS_DIR when the server is restarted, like prometheus_client's multiprocess directory.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# name -> (type, help)
+METRICS = {
+    'http_requests_total': ('counter', "Requests served, per URL name, method and status"),
+    'http_request_duration_seconds': ('histogram', "Time to build a response, per URL name and method"),
+    'http_response_size_bytes': ('histogram', "Response body size as sent, per URL name"),
+    'db_queries_per_request': ('histogram', "SQL statements run by one request, per URL name"),
+    'db_query_duration_seconds': ('histogram', "Time one request spent in SQL, per URL name"),
+    'carts_created_total': ('counter', "Pending orders created"),
+    'add_to_cart_total': ('counter', "Add to cart calls that added a product"),
+    'orders_completed_total': ('counter', "Orders moved to Completed"),
+    'reviews_posted_total': ('counter', "Reviews created"),
+    'idempotent_replays_total': ('counter', "Retries answered with the stored response of their Idempotency-Key"),
+}
+
+
+class Registry:
+    """Counters and histograms of one process, keyed by (name, sorted label pairs)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.token = uuid.uuid4().hex[:8]
+        self.counters = {}
+        # key -> [bucket bounds, per bucket counts (+Inf last), sum, count]
+        self.histograms = {}
+        self.flushed = 0.0
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = [buckets, [0] * (len(buckets) + 1), 0, 0]
+            histogram = self.histograms[key]
+            histogram[1][bisect_left(buckets, value)] += 1
+            histogram[2] += value
+            histogram[3] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [
+                    [name, labels, list(buckets), list(counts), total, count]
+                    for (name, labels), (buckets, counts, total, count) in self.histograms.items()
+                ],
+            }
+
+    def flush(self, directory):
+        """Writes the snapshot of this process to `directory`, replacing the previous one"""
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self.pid}-{self.token}.json"
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, path)
+        self.flushed = time.monotonic()
+
+
+_registry = Registry()
+
+
+def registry():
+    """This process's registry, a fresh one in workers forked after it was created"""
+    global _registry
+    if _registry.pid != os.getpid():
+        _registry = Registry()
+    return _registry
+
+
+def metrics_dir():
+    directory = getattr(settings, 'METRICS_DIR', None)
+    return Path(directory) if directory else None
+
+
+def inc(name, value=1, **labels):
+    registry().inc(name, value, **labels)
+
+
+def observe(name, value, buckets, **labels):
+    registry().observe(name, value, buckets, **labels)
+
+
+def inc_on_commit(name, value=1, **labels):
+    """Counts once the current transaction commits, so rolled back work isn't counted"""
+    transaction.on_commit(lambda: inc(name, value, **labels))
+
+
+def maybe_flush():
+    """Flushes at most every METRICS_FLUSH_INTERVAL seconds, called after each request"""
+    directory = metrics_dir()
+    current = registry()
+    if directory and time.monotonic() - current.flushed >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0):
+        current.flush(directory)
+
+
+@atexit.register
+def flush_on_exit():
+    directory = metrics_dir() if settings.configured else None
+    if directory:
+        registry().flush(directory)
+
+
+def merge(snapshots):
+    """Adds up snapshots of several processes into {key: value} and {key: [buckets, counts, sum, count]}"""
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, counts, total, count in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            if key not in histograms:
+                histograms[key] = [buckets, [0] * len(counts), 0, 0]
+            merged = histograms[key]
+            merged[1] = [a + b for a, b in zip(merged[1], counts)]
+            merged[2] += total
+            merged[3] += count
+    return counters, histograms
+
+
+def collect():
+    """Snapshots of every process sharing METRICS_DIR, or of this process alone"""
+    directory = metrics_dir()
+    if not directory:
+        return [registry().snapshot()]
+    registry().flush(directory)
+    snapshots = []
+    for path in directory.glob('*.json'):
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            # a worker was replacing it, or it's gone
+            continue
+    return snapshots
+
+
+def _labels(pairs, **extra):
+    pairs = list(pairs) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshots):
+    """Text exposition format of the merged snapshots"""
+    counters, histograms = merge(snapshots)
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+        if kind == 'counter':
+            for (key_name, labels), value in sorted(counters.items()):
+                if key_name == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            continue
+        for (key_name, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+            if key_name != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_labels(labels, le=_number(bound))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+    return '\n'.join(lines) + '\n'
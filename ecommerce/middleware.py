@@ -0,0 +1,183 @@
+import gzip
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from . import metrics
+from .db_router import pin_to_primary
+from .profiling import RequestProfile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class PrimaryPinMiddleware:
+    """Pins users to the primary database right after they changed something"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # DRF copies the authenticated user back onto the Django request
+        user = getattr(request, 'user', None)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and user is not None:
+            pin_to_primary(user)
+        return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses API responses with brotli (when installed) or gzip, whichever the client prefers.
+    Only content types in settings.API_COMPRESSION_TYPES at least settings.API_COMPRESSION_MIN_SIZE
+    bytes long are compressed, HTML is left alone so no CSRF token is exposed to BREACH.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if content_type not in getattr(settings, 'API_COMPRESSION_TYPES', ('application/json',)):
+            return response
+        if len(response.content) < getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=4)
+        else:
+            compressed = gzip.compress(response.content, compresslevel=6, mtime=0)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        return response
+
+    @staticmethod
+    def negotiate(accept_encoding):
+        """Picks br or gzip from an Accept-Encoding header, honouring q=0 and preferring br on ties"""
+        weights = {}
+        for part in accept_encoding.lower().split(','):
+            name, _, params = part.strip().partition(';')
+            weight = 1.0
+            if params.strip().startswith('q='):
+                try:
+                    weight = float(params.strip()[2:])
+                except ValueError:
+                    weight = 0.0
+            weights[name.strip()] = weight
+
+        available = ['br', 'gzip'] if brotli is not None else ['gzip']
+        candidates = [(weights.get(name, weights.get('*', 0.0)), -rank, name) for rank, name in enumerate(available)]
+        weight, _, name = max(candidates)
+        return name if weight > 0 else None
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a PROFILING_SAMPLE_RATE fraction of requests, and requests from staff carrying the
+    PROFILING_HEADER header, see `profiling.RequestProfile`. Removed from the stack unless
+    PROFILING_ENABLED is set, so it costs nothing when off.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.header = 'HTTP_' + getattr(settings, 'PROFILING_HEADER', 'X-Profile').upper().replace('-', '_')
+
+    def __call__(self, request):
+        if not self.wants_profile(request):
+            return self.get_response(request)
+
+        with RequestProfile() as profile:
+            response = self.get_response(request)
+        profile.save(request, response)
+        response.headers['X-Profile-Name'] = profile.name
+        return response
+
+    def wants_profile(self, request):
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        return bool(request.META.get(self.header)) and self.is_staff(request)
+
+    @staticmethod
+    def is_staff(request):
+        # API clients authenticate in the view, so their JWT is checked here ahead of time
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            try:
+                user, _ = JWTAuthentication().authenticate(request) or (None, None)
+            except APIException:
+                return False
+        return user is not None and user.is_staff
+
+
+class QueryCounter:
+    """Database execute wrapper counting statements and the time spent in them"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Records count, latency, response size and SQL use of every request under its URL name,
+    see `metrics`. Removed from the stack when METRICS_ENABLED is off.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as wrappers:
+            for connection in connections.all():
+                wrappers.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = (match.url_name or match.route) if match else 'unmatched'
+        metrics.inc('http_requests_total', view=view, method=request.method, status=response.status_code)
+        metrics.observe('http_request_duration_seconds', duration, metrics.LATENCY_BUCKETS,
+                        view=view, method=request.method)
+        if not response.streaming:
+            metrics.observe('http_response_size_bytes', len(response.content), metrics.SIZE_BUCKETS, view=view)
+        metrics.observe('db_queries_per_request', queries.count, metrics.QUERY_COUNT_BUCKETS, view=view)
+        metrics.observe('db_query_duration_seconds', queries.duration, metrics.LATENCY_BUCKETS, view=view)
+        metrics.maybe_flush()
+        return response
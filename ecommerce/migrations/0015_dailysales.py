@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-19 12:57
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0014_order_cancelled_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ecommerce.product')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ecommerce.shop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shop', 'date'], name='daily_sales_shop_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailysales',
+            constraint=models.UniqueConstraint(fields=('product', 'date'), name='unique_daily_sales_product_date'),
+        ),
+    ]
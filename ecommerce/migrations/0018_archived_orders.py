@@ -0,0 +1,49 @@
+# Generated by Django 5.0 on 2026-10-19 13:01
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0017_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_uuid', models.CharField(max_length=50, unique=True)),
+                ('total_price', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=10)),
+                ('created_on', models.DateTimeField()),
+                ('payment_mode', models.CharField(choices=[('Cash on Delivery', 'Cash on Delivery'), ('Card', 'Card'), ('Mobile Payment', 'Mobile Payment')], default='Cash on Delivery', max_length=100)),
+                ('delivery_mode', models.CharField(choices=[('Shipping', 'Shipping'), ('Pickup', 'Pickup')], default='Pickup', max_length=100)),
+                ('shipping_address', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Processing', 'Processing'), ('Completed', 'Completed'), ('Cancelled', 'Cancelled')], default='Completed', max_length=100)),
+                ('archived_on', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_item_uuid', models.CharField(max_length=50, unique=True)),
+                ('quantity', models.IntegerField(default=1, validators=[django.core.validators.MinValueValidator(0)])),
+                ('item_price', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=10)),
+                ('created_on', models.DateTimeField()),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='ecommerce.archivedorder')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='ecommerce.product')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['customer', 'created_on'], name='archived_order_customer_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-19 13:11
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0019_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Bestseller',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=250)),
+                ('window', models.CharField(choices=[('7d', 'Last 7 days'), ('30d', 'Last 30 days'), ('all', 'All time')], max_length=3)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ecommerce.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['scope', 'window', '-units', 'product'], name='bestseller_rank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='bestseller',
+            constraint=models.UniqueConstraint(fields=('scope', 'window', 'product'), name='unique_bestseller_entry'),
+        ),
+    ]
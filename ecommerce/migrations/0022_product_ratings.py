@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-19 13:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def compute_ratings(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Review = apps.get_model('ecommerce', 'Review')
+    ProductRating = apps.get_model('ecommerce', 'ProductRating')
+    ProductRating.objects.using(alias).bulk_create([
+        ProductRating(product_id=row['product_id'], count=row['count'], average=row['average'])
+        for row in Review.objects.using(alias).exclude(product=None).values('product_id').annotate(
+            count=models.Count('id'), average=models.Avg('ratings')
+        ).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0021_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('average', models.FloatField(default=0.0)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rating', to='ecommerce.product')),
+            ],
+        ),
+        migrations.RunPython(compute_ratings, migrations.RunPython.noop),
+    ]
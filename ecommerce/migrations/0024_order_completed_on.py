@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-19 13:50
+
+from django.db import migrations, models, router
+
+
+def date_completed_orders(apps, schema_editor):
+    # the completion time of existing orders wasn't recorded, their creation is the closest there is
+    alias = schema_editor.connection.alias
+    for name in ('Order', 'ArchivedOrder'):
+        model = apps.get_model('ecommerce', name)
+        # order shards have no archive
+        if router.allow_migrate_model(alias, model):
+            model.objects.using(alias).filter(status='Completed', completed_on=None).update(
+                completed_on=models.F('created_on')
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0023_order_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='completed_on',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='completed_on',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(date_completed_orders, migrations.RunPython.noop, hints={'model_name': 'order'}),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-19 16:20
+
+from django.db import migrations, models
+from django.db.models.functions import Greatest
+
+
+def date_order_updates(apps, schema_editor):
+    # past cart changes weren't recorded, the last item added is the closest there is
+    alias = schema_editor.connection.alias
+    Order = apps.get_model('ecommerce', 'Order')
+    OrderItem = apps.get_model('ecommerce', 'OrderItem')
+    Order.objects.using(alias).update(updated_on=models.F('created_on'))
+    last_item = OrderItem.objects.using(alias).filter(order=models.OuterRef('pk')).values('order').annotate(
+        last=models.Max('created_on')
+    ).values('last')
+    Order.objects.using(alias).filter(id__in=OrderItem.objects.using(alias).values('order_id')).update(
+        updated_on=Greatest('created_on', models.Subquery(last_item))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0024_order_completed_on'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='updated_on',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(date_order_updates, migrations.RunPython.noop, hints={'model_name': 'order'}),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'updated_on'], name='order_status_updated_idx'),
+        ),
+    ]
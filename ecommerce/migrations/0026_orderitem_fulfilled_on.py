@@ -0,0 +1,31 @@
+# Generated by Django 5.0 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+def fulfil_completed_orders(apps, schema_editor):
+    # items of orders completed before shops fulfilled their own part were fulfilled with the order
+    alias = schema_editor.connection.alias
+    Order = apps.get_model('ecommerce', 'Order')
+    OrderItem = apps.get_model('ecommerce', 'OrderItem')
+    OrderItem.objects.using(alias).filter(order__status='Completed', fulfilled_on=None).update(
+        fulfilled_on=models.Subquery(
+            Order.objects.using(alias).filter(id=models.OuterRef('order_id')).values('completed_on')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0025_order_updated_on'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='fulfilled_on',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fulfil_completed_orders, migrations.RunPython.noop, hints={'model_name': 'orderitem'}),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
+import hashlib
 import os
 import uuid
 from django.utils import timezone
@@ -35,7 +36,16 @@ class Shop(models.Model):
 
 
 def get_product_image_path(instance, filename):
-    unique_filename = f"{str(uuid.uuid4())}-{filename}"
+    # name images after their content so their URL never changes and can be cached forever
+    name, extension = os.path.splitext(filename)
+    try:
+        digest = hashlib.sha256()
+        for chunk in instance.image.chunks():
+            digest.update(chunk)
+        instance.image.seek(0)
+        unique_filename = f"{name}.{digest.hexdigest()[:16]}{extension}"
+    except (ValueError, OSError):
+        unique_filename = f"{str(uuid.uuid4())}-{filename}"
 
     product_uuid = instance.product_uuid
     return f"product_images/{product_uuid}/{unique_filename}"
@@ -80,22 +90,44 @@ STATUS_CHOICES = [
     ('Pending', 'Pending'),
     ('Processing', 'Processing'),
     ('Completed', 'Completed'),
+    ('Cancelled', 'Cancelled'),
 ]
 
+# Allowed order status moves, keyed by the current status
+ORDER_STATUS_TRANSITIONS = {
+    'Pending': ('Processing', 'Cancelled'),
+    'Processing': ('Completed', 'Cancelled'),
+    'Completed': (),
+    'Cancelled': (),
+}
+
 
 class Order(models.Model):
     order_uuid = models.CharField(max_length=50, unique=True)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal(0.0))
     created_on = models.DateTimeField(auto_now_add=True)
+    # every cart change saves the order, stale carts are found by it
+    updated_on = models.DateTimeField(auto_now=True)
     payment_mode = models.CharField(max_length=100, choices=PAYMENT_OPTION, default='Cash on Delivery')
     delivery_mode = models.CharField(max_length=100, choices=DELIVERY_OPTION, default='Pickup')
     shipping_address = models.TextField(null=True, blank=True)
     status = models.CharField(max_length=100, choices=STATUS_CHOICES, default='Pending')
-    customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    # when the order reached Completed, sales are dated by it
+    completed_on = models.DateTimeField(null=True, blank=True)
+    # orders may live in another database than users and products, see ecommerce/sharding.py
+    customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', 'status'], name='order_customer_status_idx'),
+            models.Index(fields=['status', 'created_on'], name='order_status_created_idx'),
+            models.Index(fields=['status', 'updated_on'], name='order_status_updated_idx'),
+        ]
 
     @classmethod
     def get_completed_orders_for_user(cls, user):
-        return cls.objects.filter(customer=user).exclude(status='Pending')
+        """Orders `user` placed and didn't cancel"""
+        return cls.objects.filter(customer=user, status__in=('Processing', 'Completed'))
 
     def __str__(self):
         return self.customer.username
@@ -103,13 +135,15 @@ class Order(models.Model):
 
 class OrderItem(models.Model):
     order_item_uuid = models.CharField(max_length=50, unique=True)
-    product = models.ForeignKey(Product, models.SET_NULL, null=True, blank=True)
+    product = models.ForeignKey(Product, models.SET_NULL, null=True, blank=True, db_constraint=False)
     quantity = models.IntegerField(default=1, validators=[MinValueValidator(0)])
     item_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal(0.0))
     order = models.ForeignKey(Order, on_delete=models.CASCADE, null=True, blank=True)
 
     created_on = models.DateTimeField(auto_now_add=True)
-    customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    # when the shop of the product completed its part of the order, see order_lifecycle.fulfil_orders
+    fulfilled_on = models.DateTimeField(null=True, blank=True)
+    customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False)
 
     def __str__(self):
         return self.order_item_uuid
@@ -126,3 +160,176 @@ class Review(models.Model):
         if self.product.name:
             return self.product.name
         return self.review_uuid
+
+
+class DailySales(models.Model):
+    """Completed sales of one product rolled up per day, kept in sync by `sales.record_completed_orders`"""
+    date = models.DateField()
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal(0.0))
+    units = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='unique_daily_sales_product_date')
+        ]
+        indexes = [
+            models.Index(fields=['shop', 'date'], name='daily_sales_shop_date_idx')
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.date}"
+
+
+class Stock(models.Model):
+    """Inventory of a product, products without a Stock row are not tracked"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='stock')
+    available = models.PositiveIntegerField(default=0)
+    reserved = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.available} available, {self.reserved} reserved"
+
+
+class StockReservation(models.Model):
+    """Units held for a pending order until `expires_on`"""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, db_constraint=False)
+    quantity = models.PositiveIntegerField(default=0)
+    expires_on = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'product'], name='unique_reservation_order_product')
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} {self.product_id} x{self.quantity}"
+
+
+class ArchivedOrder(models.Model):
+    """Completed order moved out of the live Order table by `manage.py archive_orders`"""
+    order_uuid = models.CharField(max_length=50, unique=True)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal(0.0))
+    created_on = models.DateTimeField()
+    payment_mode = models.CharField(max_length=100, choices=PAYMENT_OPTION, default='Cash on Delivery')
+    delivery_mode = models.CharField(max_length=100, choices=DELIVERY_OPTION, default='Pickup')
+    shipping_address = models.TextField(null=True, blank=True)
+    status = models.CharField(max_length=100, choices=STATUS_CHOICES, default='Completed')
+    completed_on = models.DateTimeField(null=True, blank=True)
+    customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    archived_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', 'created_on'], name='archived_order_customer_idx'),
+        ]
+
+    def __str__(self):
+        return self.order_uuid
+
+
+class ArchivedOrderItem(models.Model):
+    order_item_uuid = models.CharField(max_length=50, unique=True)
+    product = models.ForeignKey(Product, models.SET_NULL, null=True, blank=True)
+    quantity = models.IntegerField(default=1, validators=[MinValueValidator(0)])
+    item_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal(0.0))
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, null=True, blank=True)
+    created_on = models.DateTimeField()
+    customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+
+    def __str__(self):
+        return self.order_item_uuid
+
+
+class CoPurchase(models.Model):
+    """One non-zero cell of the product co-purchase matrix: completed orders holding both products"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='unique_co_purchase_pair')
+        ]
+        indexes = [
+            models.Index(fields=['product', '-count'], name='co_purchase_product_count_idx')
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} + {self.other_id}: {self.count}"
+
+
+class ProductRecommendation(models.Model):
+    """Top-K co-purchased products of a product, precomputed from CoPurchase"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.PositiveIntegerField(default=0)
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_recommendation_rank')
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} #{self.rank}: {self.recommended_id}"
+
+
+class Bestseller(models.Model):
+    """Sales of one product within a leaderboard scope and time window, kept in sync by `leaderboards`"""
+    WINDOW_CHOICES = (
+        ('7d', 'Last 7 days'),
+        ('30d', 'Last 30 days'),
+        ('all', 'All time'),
+    )
+    # 'global', 'shop:<shop id>' or 'category:<category>'
+    scope = models.CharField(max_length=250)
+    window = models.CharField(max_length=3, choices=WINDOW_CHOICES)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal(0.0))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'window', 'product'], name='unique_bestseller_entry')
+        ]
+        indexes = [
+            models.Index(fields=['scope', 'window', '-units', 'product'], name='bestseller_rank_idx')
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.window} {self.product_id}: {self.units}"
+
+
+class OutboxEvent(models.Model):
+    """A side effect written with the change that causes it, handed to consumers by `outbox.drain`"""
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    # only this handler runs the event when set, which is how a failed handler is retried alone
+    handler = models.CharField(max_length=250, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    processed_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(processed_on=None), name='outbox_pending_idx')
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.id}"
+
+
+class ProductRating(models.Model):
+    """Review count and average rating of a product, recomputed by `reviews.refresh_ratings`"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='rating')
+    count = models.PositiveIntegerField(default=0)
+    average = models.FloatField(default=0.0)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.average:.2f} from {self.count} reviews"
@@ -0,0 +1,158 @@
+from django.utils import timezone
+
+from . import inventory, metrics, outbox, sharding
+from .models import Order, OrderItem, StockReservation, ORDER_STATUS_TRANSITIONS
+
+
+# Statuses shops may move orders out of, placing or cancelling a cart is up to its customer
+SHOP_SOURCES = ('Processing',)
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def allowed_sources(target):
+    """Statuses an order may be in to move to `target`"""
+    return [source for source, targets in ORDER_STATUS_TRANSITIONS.items() if target in targets]
+
+
+def can_transition(current, target):
+    return target in ORDER_STATUS_TRANSITIONS.get(current, ())
+
+
+def _move_stock(previous, target, strict):
+    """Commits or gives back the stock of orders leaving Pending, returns the ids that can move"""
+    pending = [order_id for order_id, status in previous.items() if status == 'Pending']
+    if target == 'Processing':
+        failed = set()
+        for order_id in pending:
+            try:
+                with sharding.atomic():
+                    inventory.commit_order(order_id)
+            except inventory.OutOfStock:
+                if strict:
+                    raise
+                failed.add(order_id)
+        return {order_id: status for order_id, status in previous.items() if order_id not in failed}
+
+    if target == 'Cancelled':
+        inventory.release(StockReservation.objects.filter(order_id__in=pending))
+        inventory.restock_orders([order_id for order_id, status in previous.items() if status == 'Processing'])
+    return previous
+
+
+def transition_orders(queryset, target, strict=False, from_statuses=None):
+    """
+    Moves every order of `queryset` that is allowed to reach `target` with a single guarded UPDATE.
+    Orders in a status that can't reach `target` are left untouched, and so are orders
+    whose stock can't be committed unless `strict` is set, in which case OutOfStock is raised.
+    `from_statuses` narrows down the statuses orders may be moved out of.
+    An 'order.transitioned' outbox event is written for each of them in the same transaction.
+    `queryset` must read a single shard, see `sharding.scatter`.
+    :return: dict of {order id: previous status} for the orders that were moved
+    """
+    if target not in ORDER_STATUS_TRANSITIONS:
+        raise InvalidTransition(f"Unknown order status '{target}'")
+
+    sources = allowed_sources(target)
+    if from_statuses is not None:
+        sources = [source for source in sources if source in from_statuses]
+    if not sources:
+        raise InvalidTransition(f"Orders can't be moved to '{target}'")
+
+    shard = sharding.shard_of(queryset)
+    with sharding.use_shard(shard), sharding.atomic(shard):
+        previous = dict(
+            queryset.select_for_update().filter(status__in=sources).values_list('id', 'status')
+        )
+        if previous:
+            previous = _move_stock(previous, target, strict)
+        if not previous:
+            return {}
+
+        # the status guard is repeated so a concurrent move between the read and the write is never overwritten
+        now = timezone.now()
+        # update() skips auto_now, updated_on is set by hand
+        changes = {'status': target, 'updated_on': now}
+        if target == 'Completed':
+            changes['completed_on'] = now
+        updated = Order.objects.filter(id__in=previous.keys(), status__in=sources).update(**changes)
+        if updated != len(previous):
+            moved = set(Order.objects.filter(id__in=previous.keys(), status=target).values_list('id', flat=True))
+            previous = {order_id: status for order_id, status in previous.items() if order_id in moved}
+
+        outbox.publish('order.transitioned', *[
+            {'order_id': order_id, 'shard': shard, 'previous': status, 'status': target}
+            for order_id, status in previous.items()
+        ])
+        if target == 'Completed':
+            metrics.inc_on_commit('orders_completed_total', len(previous))
+    return previous
+
+
+def fulfil_orders(queryset, product_ids):
+    """
+    Completes a shop's part of the Processing orders of `queryset`: their items of `product_ids` are marked
+    fulfilled, and each order holding no other unfulfilled item moves to Completed.
+    Items of deleted products have no shop left to fulfil them and don't hold their order back.
+    `queryset` must read a single shard, see `sharding.scatter`.
+    :return: (dict of {order id: previous status} for the completed orders,
+              ids of the orders still waiting for other shops)
+    """
+    shard = sharding.shard_of(queryset)
+    with sharding.use_shard(shard), sharding.atomic(shard):
+        ids = list(queryset.select_for_update().filter(
+            status__in=SHOP_SOURCES, id__in=OrderItem.objects.filter(product_id__in=product_ids).values('order_id')
+        ).values_list('id', flat=True))
+        if not ids:
+            return {}, set()
+        OrderItem.objects.filter(order_id__in=ids, product_id__in=product_ids, fulfilled_on=None).update(
+            fulfilled_on=timezone.now()
+        )
+        waiting = set(OrderItem.objects.filter(
+            order_id__in=ids, product__isnull=False, fulfilled_on=None
+        ).values_list('order_id', flat=True))
+        completed = transition_orders(
+            Order.objects.filter(id__in=set(ids) - waiting), 'Completed', from_statuses=SHOP_SOURCES
+        )
+    return completed, waiting
+
+
+def transition_order(order, target):
+    """Moves a single order, raising InvalidTransition when the move isn't allowed and OutOfStock when checkout fails"""
+    if not can_transition(order.status, target):
+        raise InvalidTransition(f"Order can't move from '{order.status}' to '{target}'")
+
+    moved = transition_orders(Order.objects.filter(id=order.id), target, strict=True)
+    if not moved:
+        raise InvalidTransition(f"Order is no longer '{order.status}'")
+    order.status = target
+    return order
+
+
+def stale_pending_orders(cutoff, empty_only=False):
+    """Pending orders whose cart hasn't changed since `cutoff`"""
+    orders = Order.objects.filter(status='Pending', updated_on__lt=cutoff)
+    if empty_only:
+        return orders.filter(orderitem__isnull=True)
+    return orders
+
+
+def delete_pending_orders(queryset, batch_size=500):
+    """
+    Deletes the pending orders of `queryset` with their items, `batch_size` orders per transaction
+    so no single delete holds locks for long. Held stock goes back on the shelf first.
+    `queryset` must read a single shard, see `sharding.scatter`.
+    :return: iterator of the number of orders deleted per batch
+    """
+    shard = sharding.shard_of(queryset)
+    while True:
+        with sharding.use_shard(shard), sharding.atomic(shard):
+            ids = list(queryset.filter(status='Pending').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return
+            inventory.release(StockReservation.objects.filter(order_id__in=ids))
+            OrderItem.objects.filter(order_id__in=ids).delete()
+            Order.objects.filter(id__in=ids, status='Pending').delete()
+        yield len(ids)
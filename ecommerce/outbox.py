@@ -0,0 +1,93 @@
+"""
+Transactional outbox.
+
+Views publish events in the same transaction as the order or review change they describe, so an event
+exists if and only if the change committed. `manage.py drain_outbox` hands pending events to the handlers
+registered for their topic, a batch at a time, which keeps side effects out of the request whatever
+the number of consumers.
+
+Handlers receive the list of payloads of one batch and run in their own savepoint, inside the transaction
+that marks the batch processed. A failing handler is retried on its own through copies of its events,
+up to OUTBOX_MAX_ATTEMPTS times; events that used them all stay pending as dead letters.
+"""
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.transaction import TransactionManagementError
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+_handlers = defaultdict(list)
+
+
+def handler_name(func):
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def handler(topic):
+    """Registers the decorated function as a consumer of `topic`, it's called with a list of payloads"""
+    def register(func):
+        _handlers[topic].append(func)
+        return func
+    return register
+
+
+def publish(topic, *payloads):
+    """Writes one event per payload, must run inside the transaction making the change"""
+    if not transaction.get_connection().in_atomic_block:
+        raise TransactionManagementError("Outbox events must be published inside a transaction")
+    OutboxEvent.objects.bulk_create([OutboxEvent(topic=topic, payload=payload) for payload in payloads])
+
+
+def drain(batch_size=None, max_attempts=None):
+    """
+    Hands the oldest batch of pending events to their handlers
+    :return: (events processed, events queued for a retry)
+    """
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 500)
+    max_attempts = max_attempts or getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+
+    with transaction.atomic():
+        # skip_locked lets several workers drain side by side where the database supports it
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_on=None, attempts__lt=max_attempts).order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0, 0
+
+        by_topic = defaultdict(list)
+        for event in events:
+            by_topic[event.topic].append(event)
+
+        retries = []
+        for topic, topic_events in by_topic.items():
+            for func in _handlers[topic]:
+                name = handler_name(func)
+                own = [event for event in topic_events if event.handler in ('', name)]
+                if not own:
+                    continue
+                try:
+                    with transaction.atomic():
+                        func([event.payload for event in own])
+                except Exception as error:
+                    retries += [
+                        OutboxEvent(topic=topic, payload=event.payload, handler=name, attempts=event.attempts + 1,
+                                    last_error=repr(error))
+                        for event in own
+                    ]
+
+        OutboxEvent.objects.filter(id__in=[event.id for event in events]).update(processed_on=timezone.now())
+        OutboxEvent.objects.bulk_create(retries)
+    return len(events), len(retries)
+
+
+def purge(before=None):
+    """Deletes events processed before `before`, OUTBOX_RETENTION ago by default, returns how many"""
+    if before is None:
+        before = timezone.now() - getattr(settings, 'OUTBOX_RETENTION', datetime.timedelta(days=7))
+    deleted, _ = OutboxEvent.objects.filter(processed_on__lt=before).delete()
+    return deleted
@@ -0,0 +1,33 @@
+"""
+Ownership checks for the shop, review and order views.
+
+DRF builds a new view instance per request, so whatever these mixins memoize on `self`
+lives for exactly one request.
+"""
+from .shops import get_owner_shop
+
+
+class MemoizedObjectMixin:
+    """Fetches the view's object once, however many times `get_object` is called"""
+
+    def get_object(self):
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+
+class OwnedObjectMixin(MemoizedObjectMixin):
+    """`is_owner` compares `obj.<owner_field>_id` with the caller's id, so the owner row is never fetched"""
+    owner_field = 'user'
+
+    def is_owner(self, obj):
+        return getattr(obj, f"{self.owner_field}_id") == self.request.user.id
+
+
+class ShopOwnerMixin:
+    """The caller's shop, read from the shop cache once per request, None when they have none"""
+
+    def get_shop(self):
+        if not hasattr(self, '_shop'):
+            self._shop = get_owner_shop(self.request.user)
+        return self._shop
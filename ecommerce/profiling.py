@@ -0,0 +1,156 @@
+"""
+Request profiles captured by `middleware.ProfilingMiddleware`.
+
+A profile is three files sharing a name under PROFILING_DIR:
+- `<name>.folded`: stacks sampled from the request thread every PROFILING_SAMPLE_INTERVAL seconds,
+  in the collapsed format flamegraph.pl and speedscope read
+- `<name>.prof`: cProfile stats, for pstats or snakeviz
+- `<name>.json`: the request, its timings and every SQL statement it ran with its duration
+"""
+import cProfile
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+PROFILE_FILES = {
+    'folded': 'text/plain',
+    'prof': 'application/octet-stream',
+    'json': 'application/json',
+}
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+class StackSampler(threading.Thread):
+    """Counts the stacks of one thread, sampled at a fixed interval until `stop()`"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class QueryRecorder:
+    """Records the SQL and duration of every statement, through a database execute wrapper"""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': self.alias,
+                'sql': sql,
+                'many': many,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+
+class RequestProfile:
+    """Context manager profiling everything the current thread runs inside it"""
+
+    def __init__(self):
+        self.name = f"{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.001))
+        self.recorders = [QueryRecorder(alias) for alias in connections]
+        self.wrappers = ExitStack()
+        self.duration = None
+
+    def __enter__(self):
+        for recorder in self.recorders:
+            self.wrappers.enter_context(connections[recorder.alias].execute_wrapper(recorder))
+        self.sampler.start()
+        self.started = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+        self.sampler.stop()
+        self.wrappers.close()
+
+    def save(self, request, response):
+        """Writes the profile files and drops the oldest profiles past PROFILING_KEEP"""
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        queries = [query for recorder in self.recorders for query in recorder.queries]
+        match = getattr(request, 'resolver_match', None)
+        summary = {
+            'name': self.name,
+            'method': request.method,
+            'path': request.path,
+            'url_name': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round(self.duration * 1000, 3),
+            'query_count': len(queries),
+            'query_ms': round(sum(query['duration_ms'] for query in queries), 3),
+            'samples': sum(self.sampler.stacks.values()),
+            'queries': queries,
+        }
+        (directory / f"{self.name}.folded").write_text(self.sampler.collapsed())
+        self.profiler.dump_stats(directory / f"{self.name}.prof")
+        (directory / f"{self.name}.json").write_text(json.dumps(summary, indent=2))
+        prune(getattr(settings, 'PROFILING_KEEP', 200))
+        return summary
+
+
+def list_profiles():
+    """Summaries of the stored profiles, newest first, without their queries"""
+    profiles = []
+    for path in sorted(profile_dir().glob('*.json'), reverse=True):
+        summary = json.loads(path.read_text())
+        summary.pop('queries', None)
+        profiles.append(summary)
+    return profiles
+
+
+def get_profile_file(name, kind):
+    """Path of one file of a stored profile, None when there's no such file"""
+    if kind not in PROFILE_FILES or Path(name).name != name:
+        return None
+    path = profile_dir() / f"{name}.{kind}"
+    return path if path.is_file() else None
+
+
+def prune(keep):
+    names = sorted(path.stem for path in profile_dir().glob('*.json'))
+    for name in names[:max(len(names) - keep, 0)]:
+        for kind in PROFILE_FILES:
+            (profile_dir() / f"{name}.{kind}").unlink(missing_ok=True)
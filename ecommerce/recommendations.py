@@ -0,0 +1,104 @@
+"""
+"Customers also bought" recommendations.
+
+The co-purchase matrix is sparse: each product only ever shares orders with a handful of others,
+so it is kept as {product id: Counter({other product id: orders holding both})} in memory and as
+one CoPurchase row per non-zero cell in the database. Only the top-K cells of each row are copied
+to ProductRecommendation, which is what the API reads.
+"""
+import heapq
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+
+from django.conf import settings
+from django.db import models, transaction
+
+from . import sharding
+from .models import ArchivedOrderItem, CoPurchase, OrderItem, ProductRecommendation
+
+
+def top_k():
+    return getattr(settings, 'RECOMMENDATIONS_TOP_K', 10)
+
+
+def co_purchase_matrix(*order_items):
+    """Builds the sparse matrix from querysets of order items, each order adds 1 to every pair it holds"""
+    matrix = defaultdict(Counter)
+    for queryset in order_items:
+        rows = queryset.exclude(product=None).values_list('order_id', 'product_id').order_by('order_id').iterator()
+        for _, items in groupby(rows, key=lambda row: row[0]):
+            products = sorted({product_id for _, product_id in items})
+            for product_id, other_id in combinations(products, 2):
+                matrix[product_id][other_id] += 1
+                matrix[other_id][product_id] += 1
+    return matrix
+
+
+def _top(row, k):
+    # highest count first, lowest product id on ties so results are stable
+    return heapq.nsmallest(k, row.items(), key=lambda cell: (-cell[1], cell[0]))
+
+
+def rebuild_recommendations(batch_size=1000):
+    """
+    Recomputes the whole matrix and every top-K list from order history
+    :return: number of products with recommendations
+    """
+    matrix = co_purchase_matrix(
+        *sharding.scatter(OrderItem.objects.filter(order__status='Completed')), ArchivedOrderItem.objects.all()
+    )
+    k = top_k()
+    with transaction.atomic():
+        CoPurchase.objects.all().delete()
+        CoPurchase.objects.bulk_create((
+            CoPurchase(product_id=product_id, other_id=other_id, count=count)
+            for product_id, row in matrix.items() for other_id, count in row.items()
+        ), batch_size=batch_size)
+        ProductRecommendation.objects.all().delete()
+        ProductRecommendation.objects.bulk_create((
+            ProductRecommendation(product_id=product_id, recommended_id=other_id, score=count, rank=rank)
+            for product_id, row in matrix.items() for rank, (other_id, count) in enumerate(_top(row, k), 1)
+        ), batch_size=batch_size)
+    return len(matrix)
+
+
+def add_orders(order_ids):
+    """
+    Adds freshly completed orders to the matrix and refreshes the top-K lists of the products they hold.
+    Concurrent runs can lose an increment on a brand new pair; `build_recommendations` corrects that.
+    """
+    delta = co_purchase_matrix(OrderItem.objects.filter(order_id__in=order_ids))
+    if not delta:
+        return
+    with transaction.atomic():
+        for product_id, row in delta.items():
+            existing = set(CoPurchase.objects.filter(product_id=product_id, other_id__in=row.keys())
+                           .values_list('other_id', flat=True))
+            if existing:
+                # one UPDATE per row of the matrix, F() keeps concurrent increments
+                CoPurchase.objects.filter(product_id=product_id, other_id__in=existing).update(
+                    count=models.F('count') + models.Case(
+                        *[models.When(other_id=other_id, then=row[other_id]) for other_id in existing]
+                    )
+                )
+            CoPurchase.objects.bulk_create([
+                CoPurchase(product_id=product_id, other_id=other_id, count=count)
+                for other_id, count in row.items() if other_id not in existing
+            ], ignore_conflicts=True)
+        refresh_top_k(delta.keys())
+
+
+def refresh_top_k(product_ids):
+    """Copies the top-K cells of each product's matrix row to ProductRecommendation"""
+    k = top_k()
+    with transaction.atomic():
+        ProductRecommendation.objects.filter(product_id__in=product_ids).delete()
+        rows = []
+        for product_id in product_ids:
+            # served by the (product, -count) index
+            cells = CoPurchase.objects.filter(product_id=product_id).order_by('-count', 'other_id')[:k]
+            rows += [
+                ProductRecommendation(product_id=product_id, recommended_id=cell.other_id, score=cell.count, rank=rank)
+                for rank, cell in enumerate(cells, 1)
+            ]
+        ProductRecommendation.objects.bulk_create(rows)
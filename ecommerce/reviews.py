@@ -0,0 +1,99 @@
+"""
+Bulk review ingestion and moderation.
+
+Both work in batches: one INSERT or DELETE per batch, then one GROUP BY recomputing the ratings
+of the products the batch touched, and one outbox event describing the batch.
+"""
+import uuid
+
+from django.db import models, transaction
+
+from . import catalog, outbox
+from .models import Product, ProductRating, Review
+
+
+def refresh_ratings(product_ids):
+    """Recomputes the review count and average rating of `product_ids` with a single aggregate query"""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    ratings = Review.objects.filter(product_id__in=product_ids).values('product_id').annotate(
+        count=models.Count('id'), average=models.Avg('ratings')
+    ).order_by()
+    with transaction.atomic():
+        ProductRating.objects.filter(product_id__in=product_ids).delete()
+        ProductRating.objects.bulk_create([
+            ProductRating(product_id=row['product_id'], count=row['count'], average=row['average']) for row in ratings
+        ])
+        # list pages show the ratings
+        catalog.invalidate_products(product_ids)
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def bulk_create_reviews(shop, reviews, user=None, batch_size=1000):
+    """
+    Creates reviews of `shop`'s products from dicts with product_uuid, text, ratings and optionally a
+    review_uuid, which makes re-running an import skip the reviews it already created.
+    :return: (reviews created, errors as {'index': position in `reviews`, 'error': message})
+    """
+    product_ids = dict(Product.objects.filter(
+        shop=shop, product_uuid__in={review['product_uuid'] for review in reviews}
+    ).values_list('product_uuid', 'id'))
+
+    rows, errors = [], []
+    for index, review in enumerate(reviews):
+        product_id = product_ids.get(review['product_uuid'])
+        if product_id is None:
+            errors.append({'index': index, 'error': f"No product '{review['product_uuid']}' in this shop"})
+            continue
+        rows.append(Review(review_uuid=review.get('review_uuid') or str(uuid.uuid4()), product_id=product_id,
+                           user=user, text=review['text'], ratings=review['ratings']))
+
+    created = 0
+    for batch in _batches(rows, batch_size):
+        uuids = [row.review_uuid for row in batch]
+        with transaction.atomic():
+            existing = Review.objects.filter(review_uuid__in=uuids).count()
+            Review.objects.bulk_create(batch, ignore_conflicts=True)
+            created += Review.objects.filter(review_uuid__in=uuids).count() - existing
+            product_ids_touched = {row.product_id for row in batch}
+            refresh_ratings(product_ids_touched)
+            outbox.publish('review.bulk_created', {'review_uuids': uuids, 'product_ids': sorted(product_ids_touched)})
+    return created, errors
+
+
+def shop_reviews(shop, review_uuids=None, product_uuid=None, username=None, contains=None):
+    """Reviews of `shop`'s products narrowed down by every filter given"""
+    queryset = Review.objects.filter(product__shop=shop)
+    if review_uuids is not None:
+        queryset = queryset.filter(review_uuid__in=review_uuids)
+    if product_uuid is not None:
+        queryset = queryset.filter(product__product_uuid=product_uuid)
+    if username is not None:
+        queryset = queryset.filter(user__username=username)
+    if contains is not None:
+        queryset = queryset.filter(text__icontains=contains)
+    return queryset
+
+
+def bulk_delete_reviews(queryset, batch_size=1000):
+    """
+    Deletes the reviews of `queryset` one batch per transaction, yields the size of each batch.
+    Each batch is re-selected from `queryset`, so `queryset` must not be sliced.
+    """
+    while True:
+        with transaction.atomic():
+            batch = list(queryset.values_list('id', 'review_uuid', 'product_id')[:batch_size])
+            if not batch:
+                return
+            Review.objects.filter(id__in=[review_id for review_id, _, _ in batch]).delete()
+            product_ids = {product_id for _, _, product_id in batch if product_id is not None}
+            refresh_ratings(product_ids)
+            outbox.publish('review.bulk_deleted', {
+                'review_uuids': [review_uuid for _, review_uuid, _ in batch], 'product_ids': sorted(product_ids)
+            })
+        yield len(batch)
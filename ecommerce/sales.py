@@ -0,0 +1,149 @@
+from itertools import islice
+
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+
+from . import sharding
+from .models import ArchivedOrderItem, DailySales, OrderItem, Product
+
+REPORT_INTERVALS = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def daily_buckets(order_items, chunk_size=1000):
+    """
+    Groups completed order items into (product, day the order completed) buckets, yields them with the shop
+    and category of their product. Those are read from the products a chunk at a time, not joined, because
+    the order items may live in an order shard.
+    """
+    rows = order_items.exclude(product=None).annotate(
+        date=TruncDate('order__completed_on')
+    ).values('date', 'product_id').annotate(
+        revenue=models.Sum('item_price'),
+        units=models.Sum('quantity'),
+        orders=models.Count('order_id', distinct=True),
+    ).order_by().iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        products = {
+            product_id: (shop_id, category) for product_id, shop_id, category in Product.objects.filter(
+                id__in={bucket['product_id'] for bucket in chunk}
+            ).exclude(shop=None).values_list('id', 'shop_id', 'category')
+        }
+        for bucket in chunk:
+            if bucket['product_id'] in products:
+                bucket['product__shop_id'], bucket['product__category'] = products[bucket['product_id']]
+                yield bucket
+
+
+def _add_to_bucket(bucket):
+    lookup = {'product_id': bucket['product_id'], 'date': bucket['date']}
+    increments = {
+        'revenue': models.F('revenue') + bucket['revenue'],
+        'units': models.F('units') + bucket['units'],
+        'orders': models.F('orders') + bucket['orders'],
+    }
+    if DailySales.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            DailySales.objects.create(
+                shop_id=bucket['product__shop_id'],
+                revenue=bucket['revenue'],
+                units=bucket['units'],
+                orders=bucket['orders'],
+                **lookup
+            )
+    except IntegrityError:
+        # another worker created the row in the meantime
+        DailySales.objects.filter(**lookup).update(**increments)
+
+
+def record_completed_orders(order_ids):
+    """Adds freshly completed orders to the daily rollups, one UPDATE per touched (product, day)"""
+    with transaction.atomic():
+        for bucket in daily_buckets(OrderItem.objects.filter(order_id__in=order_ids)):
+            _add_to_bucket(bucket)
+
+
+def rebuild_daily_sales(start=None, end=None, batch_size=1000):
+    """
+    Recomputes the daily rollups from order history for the days between `start` and `end` (both inclusive)
+    :return: number of rollup rows written
+    """
+    sources = sharding.scatter(OrderItem.objects.filter(order__status='Completed')) + [
+        ArchivedOrderItem.objects.all(),
+    ]
+    rollups = DailySales.objects.all()
+    if start:
+        sources = [order_items.filter(order__completed_on__date__gte=start) for order_items in sources]
+        rollups = rollups.filter(date__gte=start)
+    if end:
+        sources = [order_items.filter(order__completed_on__date__lte=end) for order_items in sources]
+        rollups = rollups.filter(date__lte=end)
+
+    # live orders of each shard and archived orders are bucketed separately and merged here
+    rows = {}
+    for order_items in sources:
+        for bucket in daily_buckets(order_items):
+            key = (bucket['product_id'], bucket['date'])
+            if key not in rows:
+                rows[key] = DailySales(date=bucket['date'], shop_id=bucket['product__shop_id'],
+                                       product_id=bucket['product_id'])
+            rows[key].revenue += bucket['revenue']
+            rows[key].units += bucket['units']
+            rows[key].orders += bucket['orders']
+    rows = list(rows.values())
+    with transaction.atomic():
+        rollups.delete()
+        DailySales.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def shop_order_summary(shop):
+    """
+    Revenue and number of items sold by `shop` over live and archived completed orders, and the items
+    of its products sitting in pending orders. Every order shard is queried in parallel and merged here.
+    """
+    products = dict(Product.objects.filter(shop=shop).values_list('id', 'name'))
+
+    def shard_summary(order_items):
+        # product ids rather than a join on products, which don't live in the order shards
+        order_items = order_items.filter(product_id__in=list(products))
+        sold = order_items.filter(order__status='Completed').aggregate(
+            revenue=models.Sum('item_price'), items=models.Count('id')
+        )
+        return sold, list(order_items.filter(order__status='Pending').values_list('product_id', 'quantity'))
+
+    shards = sharding.gather(shard_summary, sharding.scatter(OrderItem.objects.all()))
+    archived = ArchivedOrderItem.objects.filter(product__shop=shop).aggregate(
+        revenue=models.Sum('item_price'), items=models.Count('id')
+    )
+    sold = [summary for summary, _ in shards] + [archived]
+    return {
+        'total_revenue': sum(summary['revenue'] or 0 for summary in sold) or 0.0,
+        'total_orders': sum(summary['items'] for summary in sold),
+        'pending_order_products': [
+            {'product__name': products[product_id], 'quantity': quantity}
+            for _, pending in shards for product_id, quantity in pending
+        ],
+    }
+
+
+def sales_report(shop, start, end, interval='day', product_uuid=None):
+    """Merges the daily rollups of `shop` into one bucket per product and interval"""
+    rollups = DailySales.objects.filter(shop=shop, date__gte=start, date__lte=end)
+    if product_uuid:
+        rollups = rollups.filter(product__product_uuid=product_uuid)
+
+    trunc = REPORT_INTERVALS[interval]
+    period = trunc('date') if trunc else models.F('date')
+    return rollups.annotate(period=period).values(
+        'period', 'product__product_uuid', 'product__name'
+    ).annotate(
+        revenue=models.Sum('revenue'),
+        units=models.Sum('units'),
+        orders=models.Sum('orders'),
+    ).order_by('period', 'product__name')
@@ -0,0 +1,54 @@
+"""
+The OpenAPI schema of the API, built with drf_yasg.
+
+drf_yasg (and pkg_resources, which it imports) is too heavy to load in every worker and management
+command, so this module is only imported by the docs views on their first request and by
+`manage.py generate_openapi_schema`. The schema doesn't depend on the request: it's the same for every
+caller, has no host (clients use the one they called) and is built once per process.
+"""
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+INFO = openapi.Info(
+    title="Snippets API",
+    default_version='v1',
+    description="Test description",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="contact@snippets.local"),
+    license=openapi.License(name="BSD License"),
+)
+
+_schema = []
+
+
+def get_schema():
+    if not _schema:
+        # some views pick their serializer from the request, so they're introspected with an anonymous one,
+        # and the empty url keeps its host out of the schema
+        request = APIView().initialize_request(APIRequestFactory().get('/docs.json/'))
+        _schema.append(OpenAPISchemaGenerator(INFO, url='').get_schema(request=request, public=True))
+    return _schema[0]
+
+
+def render_json():
+    return OpenAPICodecJson(validators=[]).encode(get_schema())
+
+
+class CachedSchemaGenerator(OpenAPISchemaGenerator):
+    """Hands the schema views the schema of get_schema() instead of building one per request"""
+
+    def get_schema(self, request=None, public=False):
+        return get_schema()
+
+
+schema_view = get_schema_view(
+    INFO,
+    public=True,
+    generator_class=CachedSchemaGenerator,
+    permission_classes=(permissions.AllowAny,),
+)
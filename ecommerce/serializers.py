@@ -13,12 +13,8 @@ class UserCreationSerializer(serializers.ModelSerializer):
         }
 
     def create(self, validated_data):
-        password = validated_data.pop('password')
-        user = User.objects.create_user(**validated_data)
-        user.set_password(password)
-        user.save()
-
-        return user
+        # create_user hashes the password and saves once
+        return User.objects.create_user(**validated_data)
 
 
 class ChangePasswordSerializer(serializers.Serializer):
@@ -82,6 +78,9 @@ class ProductCreateSerializer(serializers.ModelSerializer):
 class ProductSerializer(serializers.ModelSerializer):
     shop_name = serializers.CharField(source="shop.name", read_only=True)
     product_uuid = serializers.UUIDField(read_only=True)
+    # None until the product has a review
+    rating_average = serializers.FloatField(source='rating.average', read_only=True)
+    rating_count = serializers.IntegerField(source='rating.count', read_only=True)
 
     class Meta:
         model = Product
@@ -97,6 +96,13 @@ class ProductUpdateSerializer(serializers.ModelSerializer):
         read_only_fields = ('shop', 'product_uuid')
 
 
+class StockSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Stock
+        fields = ('available', 'reserved')
+        read_only_fields = ('reserved',)
+
+
 class ReviewCreateSerializer(serializers.ModelSerializer):
     user = serializers.CharField(source='user.full_name', read_only=True)
     review_uuid = serializers.UUIDField(read_only=True)
@@ -116,6 +122,29 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class BulkReviewSerializer(serializers.Serializer):
+    product_uuid = serializers.CharField()
+    text = serializers.CharField()
+    ratings = serializers.FloatField(min_value=0, max_value=5)
+    review_uuid = serializers.CharField(max_length=50, required=False)
+
+
+class BulkReviewCreateSerializer(serializers.Serializer):
+    reviews = BulkReviewSerializer(many=True, allow_empty=False)
+
+
+class BulkReviewDeleteSerializer(serializers.Serializer):
+    review_uuids = serializers.ListField(child=serializers.CharField(), required=False, allow_empty=False)
+    product_uuid = serializers.CharField(required=False)
+    username = serializers.CharField(required=False)
+    contains = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError("Pick the reviews to delete with at least one filter")
+        return attrs
+
+
 class ReviewUpdateSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     user = serializers.CharField(source='user.full_name', read_only=True)
@@ -134,6 +163,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = '__all__'
+        read_only_fields = ('fulfilled_on',)
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -142,7 +172,8 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = '__all__'
+        # internal, OrderValuesSerializer and archived orders don't have it
+        exclude = ('updated_on',)
 
 
 class UpdateOrderSerializer(serializers.ModelSerializer):
@@ -151,5 +182,35 @@ class UpdateOrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = '__all__'
-        read_only_fields = ('order_uuid', 'total_price', 'customer')
+        exclude = ('updated_on',)
+        # statuses only change through order_lifecycle, see UpdateOrderView and ShopOrderTransitionView
+        read_only_fields = ('order_uuid', 'total_price', 'customer', 'status', 'completed_on')
+
+
+class OrderTransitionSerializer(serializers.Serializer):
+    order_uuids = serializers.ListField(child=serializers.CharField(), allow_empty=False, max_length=10000)
+    status = serializers.ChoiceField(choices=STATUS_CHOICES)
+
+
+class SalesReportQuerySerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    interval = serializers.ChoiceField(choices=['day', 'week', 'month'], default='day')
+    product = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError("start must be before end")
+        return attrs
+
+
+class BestsellerQuerySerializer(serializers.Serializer):
+    window = serializers.ChoiceField(choices=[choice for choice, _ in Bestseller.WINDOW_CHOICES], default='all')
+    category = serializers.ChoiceField(choices=PRODUCT_CATEGORIES, required=False)
+    shop = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    def validate(self, attrs):
+        if 'category' in attrs and 'shop' in attrs:
+            raise serializers.ValidationError("Pick either a category or a shop")
+        return attrs
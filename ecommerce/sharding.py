@@ -0,0 +1,163 @@
+"""
+Orders sharded by customer.
+
+An order, its items and its stock reservations live in the database ORDER_SHARDS[hash(customer id)],
+everything else stays in `default`. With the single `default` shard the router stands aside and
+nothing changes.
+
+`OrderShardRouter` places rows from the instance Django hands it (an order, its customer, ...) and
+falls back to the shard made current with `use_shard()`, which `CustomerShardMixin` does for the
+caller of a customer API view. Work spanning customers runs once per shard on `scatter()`ed querysets,
+optionally in parallel with `gather()`.
+
+Shards only hold sharded tables, so their queries can't join users or products: those are read
+separately from `default`, and the foreign keys pointing there have no database constraint.
+Primary keys are only unique within a shard, which is why outbox events carry the shard of their order.
+A change spanning `default` and a shard commits twice (see `atomic`), not atomically.
+"""
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections, router, transaction
+
+from .models import Order, OrderItem, StockReservation
+
+SHARDED_MODELS = {'ecommerce.order', 'ecommerce.orderitem', 'ecommerce.stockreservation'}
+
+# Shard of the customer the current request or task works for
+_order_shard = ContextVar('order_shard', default=None)
+
+
+def order_shards():
+    return getattr(settings, 'ORDER_SHARDS', ['default'])
+
+
+def is_sharded():
+    return order_shards() != ['default']
+
+
+def shard_for(customer_id):
+    """Shard holding the orders of `customer_id`, stable across processes"""
+    shards = order_shards()
+    return shards[zlib.crc32(str(customer_id).encode()) % len(shards)]
+
+
+@contextmanager
+def use_shard(alias):
+    token = _order_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _order_shard.reset(token)
+
+
+def current_shard():
+    return _order_shard.get() or 'default'
+
+
+def shard_of(queryset):
+    """Database a queryset of sharded rows writes to"""
+    return queryset._db or router.db_for_write(queryset.model, **queryset._hints)
+
+
+@contextmanager
+def atomic(alias=None):
+    """
+    transaction.atomic() on `default` and on `alias`, the current shard by default.
+    The shard commits first, a crash before `default` commits leaves the two apart.
+    """
+    alias = alias or current_shard()
+    with transaction.atomic():
+        if alias == 'default':
+            yield
+        else:
+            with transaction.atomic(using=alias):
+                yield
+
+
+def scatter(queryset):
+    """`queryset` once per shard, or untouched (so replica routing still applies) when not sharded"""
+    if not is_sharded():
+        return [queryset]
+    return [queryset.using(alias) for alias in order_shards()]
+
+
+def gather(function, querysets):
+    """Calls `function` on each queryset, in parallel threads when there are several, results in order"""
+    if len(querysets) == 1:
+        return [function(querysets[0])]
+
+    def call(queryset):
+        try:
+            return function(queryset)
+        finally:
+            # connections are per thread, these would otherwise stay open
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=len(querysets)) as pool:
+        return list(pool.map(call, querysets))
+
+
+class OrderShardRouter:
+    """Routes sharded models, defers everything else (and everything when not sharded) to the next router"""
+
+    def _db(self, model, **hints):
+        if not is_sharded() or model._meta.label_lower not in SHARDED_MODELS:
+            return None
+        instance = hints.get('instance')
+        if instance is not None:
+            if instance._meta.label_lower == settings.AUTH_USER_MODEL.lower():
+                # e.g. user.order_set
+                return shard_for(instance.pk)
+            if instance._meta.label_lower in SHARDED_MODELS:
+                if not instance._state.adding:
+                    return instance._state.db
+                customer_id = getattr(instance, 'customer_id', None)
+                if customer_id is not None:
+                    return shard_for(customer_id)
+                # a new reservation follows the order it was given
+                if instance._state.db:
+                    return instance._state.db
+        return _order_shard.get()
+
+    db_for_read = _db
+    db_for_write = _db
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # shards only get the sharded tables, and the data migrations declaring one of them in their hints
+        if not is_sharded() or db not in order_shards():
+            return None
+        return model_name is not None and f"{app_label}.{model_name}" in SHARDED_MODELS
+
+
+class CustomerShardMixin:
+    """Makes the shard of the authenticated caller current for the whole request"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            self._shard_token = _order_shard.set(shard_for(request.user.id))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_shard_token', None)
+        if token:
+            _order_shard.reset(token)
+            self._shard_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def detach(customer_id=None, product_id=None):
+    """
+    Does what deleting a user or a product cascades to on every shard, the ORM only cascades
+    within the database the row is deleted from
+    """
+    for alias in order_shards():
+        if customer_id is not None:
+            Order.objects.using(alias).filter(customer_id=customer_id).update(customer=None)
+            OrderItem.objects.using(alias).filter(customer_id=customer_id).update(customer=None)
+        if product_id is not None:
+            OrderItem.objects.using(alias).filter(product_id=product_id).update(product=None)
+            StockReservation.objects.using(alias).filter(product_id=product_id).delete()
@@ -0,0 +1,32 @@
+"""
+The shop of a vendor, cached across requests.
+
+Every shop API call needs the caller's shop, so it's kept in the default cache under the owner's id,
+"no shop" included, for SHOP_CACHE_TIMEOUT seconds. Saving or deleting a shop drops the entries of
+its old and new owner (see signals.py). With the per-process local memory cache other workers only
+notice when their entry expires, a shared cache (Redis, Memcached) makes that immediate.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Shop
+
+# cached for users without a shop, None means "not cached"
+NO_SHOP = False
+
+
+def _key(owner_id):
+    return f"owner-shop:{owner_id}"
+
+
+def get_owner_shop(user):
+    """The shop owned by `user`, or None"""
+    shop = cache.get(_key(user.id))
+    if shop is None:
+        shop = Shop.objects.filter(owner=user).first() or NO_SHOP
+        cache.set(_key(user.id), shop, getattr(settings, 'SHOP_CACHE_TIMEOUT', 300))
+    return shop or None
+
+
+def forget_owner_shop(*owner_ids):
+    cache.delete_many([_key(owner_id) for owner_id in owner_ids if owner_id is not None])
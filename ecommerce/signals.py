@@ -1,10 +1,16 @@
 from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.template.loader import render_to_string
 from django.urls import reverse
 
 from django_rest_passwordreset.signals import reset_password_token_created
 
+from . import catalog, leaderboards, sharding
+from .models import Product, Shop, User
+from .shops import forget_owner_shop
+
 
 @receiver(reset_password_token_created)
 def password_reset_token_created(sender, instance, reset_password_token, *args, **kwargs):
@@ -43,3 +49,62 @@ def password_reset_token_created(sender, instance, reset_password_token, *args,
     )
     msg.attach_alternative(email_html_message, "text/html")
     msg.send()
+
+
+@receiver(pre_save, sender=Shop)
+def remember_previous_owner(sender, instance, **kwargs):
+    """Keeps the owner before the save, their cached shop has to go too if the shop changes hands"""
+    if instance.pk is None:
+        instance._previous_owner_id = None
+    else:
+        instance._previous_owner_id = Shop.objects.filter(pk=instance.pk).values_list('owner_id', flat=True).first()
+
+
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+def forget_cached_shop(sender, instance, **kwargs):
+    """Drops the cached shop of its owners once the change is committed"""
+    owner_ids = (instance.owner_id, getattr(instance, '_previous_owner_id', None))
+    transaction.on_commit(lambda: forget_owner_shop(*owner_ids))
+
+
+@receiver(pre_delete, sender=User)
+def detach_customer_orders(sender, instance, **kwargs):
+    """Deleting a user only reaches the orders in its own database, the other shards are updated here"""
+    if sharding.is_sharded():
+        sharding.detach(customer_id=instance.pk)
+
+
+@receiver(pre_delete, sender=Product)
+def detach_product_orders(sender, instance, **kwargs):
+    if sharding.is_sharded():
+        sharding.detach(product_id=instance.pk)
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_category(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._previous_category = None
+    else:
+        instance._previous_category = Product.objects.filter(pk=instance.pk).values_list('category', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_catalog_pages(sender, instance, **kwargs):
+    """Drops the stored list pages showing the product, under its old and new category"""
+    catalog.invalidate({instance.category, getattr(instance, '_previous_category', None)})
+
+
+@receiver(post_save, sender=Product)
+def move_category_bestsellers(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_category', None)
+    if not created and previous is not None and previous != instance.category:
+        leaderboards.move_category(instance.pk, previous, instance.category)
+
+
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+def refresh_catalog_shop_names(sender, instance, **kwargs):
+    """List pages show shop names"""
+    catalog.invalidate()
@@ -1,3 +1,124 @@
+import uuid
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .models import Order, OrderItem, Product, Review, Shop, User
+
+
+class OwnershipQueryCountTests(TestCase):
+    """Ownership checks cost one lookup per request, see ecommerce/permissions.py"""
+
+    def setUp(self):
+        # the shop of a vendor is cached across requests, each test starts cold
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', email='owner@shop.local', password='password')
+        self.shop = Shop.objects.create(shop_uuid=str(uuid.uuid4()), name='shop', address='-', phone_number='-',
+                                        owner=self.owner)
+        self.product = Product.objects.create(product_uuid=str(uuid.uuid4()), name='product', price=10,
+                                              category='Books', shop=self.shop)
+        self.customer = User.objects.create_user(username='customer', email='customer@shop.local',
+                                                 password='password')
+        self.review = Review.objects.create(review_uuid=str(uuid.uuid4()), product=self.product, user=self.customer,
+                                            text='good', ratings=4)
+        self.order = Order.objects.create(order_uuid=str(uuid.uuid4()), customer=self.customer, total_price=10)
+        self.order_item = OrderItem.objects.create(order_item_uuid=str(uuid.uuid4()), product=self.product,
+                                                   quantity=1, item_price=10, order=self.order,
+                                                   customer=self.customer)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_review_put(self):
+        client = self.client_for(self.customer)
+        url = reverse('review', kwargs={'review_uuid': self.review.review_uuid})
+        # lookup, savepoint, UPDATE, outbox INSERT, release
+        with self.assertNumQueries(5):
+            response = client.put(url, {'text': 'better', 'ratings': 5}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_review_delete(self):
+        client = self.client_for(self.customer)
+        url = reverse('review', kwargs={'review_uuid': self.review.review_uuid})
+        with self.assertNumQueries(5):
+            response = client.delete(url)
+        self.assertEqual(response.status_code, 204)
+
+    def test_shop_product_list(self):
+        client = self.client_for(self.owner)
+        with self.assertNumQueries(2):
+            response = client.get(reverse('product-list-create'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_shop_product_get(self):
+        client = self.client_for(self.owner)
+        url = reverse('product-get-update-delete', kwargs={'product_uuid': self.product.product_uuid})
+        with self.assertNumQueries(1):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_shop_product_put(self):
+        client = self.client_for(self.owner)
+        url = reverse('product-get-update-delete', kwargs={'product_uuid': self.product.product_uuid})
+        # lookup, previous category for catalog invalidation, UPDATE
+        with self.assertNumQueries(3):
+            response = client.put(url, {'name': 'renamed', 'price': 12, 'category': 'Books', 'description': '-'},
+                                  format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_order_item_put(self):
+        client = self.client_for(self.customer)
+        url = reverse('order-item', kwargs={'order_item_uuid': self.order_item.order_item_uuid})
+        with self.assertNumQueries(6):
+            response = client.put(url, {'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+class MultiShopOrderTests(TestCase):
+    """An order holding the products of several shops completes once each shop has completed its part"""
+
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user(username='customer', email='customer@shop.local',
+                                                 password='password')
+        self.order = Order.objects.create(order_uuid=str(uuid.uuid4()), customer=self.customer, total_price=20,
+                                          status='Processing')
+        self.owners = []
+        for name in ('first', 'second'):
+            owner = User.objects.create_user(username=name, email=f'{name}@shop.local', password='password')
+            shop = Shop.objects.create(shop_uuid=str(uuid.uuid4()), name=name, address='-', phone_number='-',
+                                       owner=owner)
+            product = Product.objects.create(product_uuid=str(uuid.uuid4()), name=name, price=10,
+                                             category='Books', shop=shop)
+            OrderItem.objects.create(order_item_uuid=str(uuid.uuid4()), product=product, quantity=1, item_price=10,
+                                     order=self.order, customer=self.customer)
+            self.owners.append(owner)
+
+    def complete(self, owner):
+        client = APIClient()
+        client.force_authenticate(owner)
+        return client.post(reverse('shop-order-transition'),
+                           {'order_uuids': [self.order.order_uuid], 'status': 'Completed'}, format='json')
+
+    def test_completes_once_every_shop_is_done(self):
+        response = self.complete(self.owners[0])
+        self.assertEqual(response.data['fulfilled'], [self.order.order_uuid])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'Processing')
+
+        response = self.complete(self.owners[1])
+        self.assertEqual(response.data['order_uuids'], [self.order.order_uuid])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'Completed')
+        self.assertIsNotNone(self.order.completed_on)
 
-# Create your tests here.
+    def test_shop_cannot_cancel_shared_order(self):
+        client = APIClient()
+        client.force_authenticate(self.owners[0])
+        response = client.post(reverse('shop-order-transition'),
+                               {'order_uuids': [self.order.order_uuid], 'status': 'Cancelled'}, format='json')
+        self.assertEqual(response.data['skipped'], [self.order.order_uuid])
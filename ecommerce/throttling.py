@@ -0,0 +1,138 @@
+"""
+Token bucket throttling.
+
+Each (scope, user or IP) pair owns a bucket refilled at the scope's rate from
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] and holding up to THROTTLE_BURSTS[scope] tokens
+(the rate's request count by default). Buckets are tracked as a single "theoretical arrival time"
+(GCRA), which behaves like a token bucket but only needs one number of state per key.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """'100/min' -> (100, 60)"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class LocalBuckets:
+    """Per-process buckets in a plain dict, no lock: the GIL keeps each get/set whole"""
+    max_keys = 100000
+
+    def __init__(self):
+        self.arrivals = {}
+
+    def take(self, key, interval, tolerance):
+        now = time.monotonic()
+        arrival = self.arrivals.get(key, now)
+        if arrival < now:
+            arrival = now
+        if arrival - now > tolerance:
+            return arrival - now - tolerance
+        if len(self.arrivals) > self.max_keys:
+            self.prune(now)
+        self.arrivals[key] = arrival + interval
+        return 0.0
+
+    def prune(self, now):
+        """Forgets full buckets, they behave exactly like unknown keys"""
+        self.arrivals = {key: arrival for key, arrival in self.arrivals.items() if arrival > now}
+
+
+class CacheBuckets:
+    """
+    Buckets in a shared Django cache so every worker sees the same counts.
+    The cache API has no compare-and-set, so each read and write of a bucket holds a lock taken with
+    `cache.add`, which is atomic on every backend. Without it concurrent workers overwrite each other's
+    arrival times and let bursts through.
+    """
+    # seconds a lock is held at most, in case its worker dies, and between attempts to take it
+    lock_timeout = 1
+    lock_retry_interval = 0.001
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, interval, tolerance):
+        lock = f"{key}:lock"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout
+        while not self.cache.add(lock, token, timeout=self.lock_timeout):
+            if time.monotonic() >= deadline:
+                # fails closed, going on without the lock would let the bucket overflow
+                return self.lock_timeout
+            time.sleep(self.lock_retry_interval)
+        try:
+            # wall clock, unlike monotonic time it means the same in every worker
+            now = time.time()
+            arrival = max(self.cache.get(key, now), now)
+            if arrival - now > tolerance:
+                return arrival - now - tolerance
+            self.cache.set(key, arrival + interval, timeout=int(tolerance + interval) + 1)
+            return 0.0
+        finally:
+            # unless it expired and another worker holds it by now
+            if self.cache.get(lock) == token:
+                self.cache.delete(lock)
+
+
+_local_buckets = LocalBuckets()
+
+# scope -> (interval, tolerance) or None, and the bucket store, both read from settings once
+_shapes = {}
+_buckets = []
+
+
+def get_buckets():
+    if not _buckets:
+        alias = getattr(settings, 'THROTTLE_CACHE', None)
+        _buckets.append(CacheBuckets(alias) if alias else _local_buckets)
+    return _buckets[0]
+
+
+def get_shape(scope):
+    if scope not in _shapes:
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            _shapes[scope] = None
+        else:
+            count, period = parse_rate(rate)
+            burst = getattr(settings, 'THROTTLE_BURSTS', {}).get(scope, count)
+            interval = period / count
+            _shapes[scope] = (interval, interval * (burst - 1))
+    return _shapes[scope]
+
+
+@receiver(setting_changed)
+def reset_throttle_settings(setting, **kwargs):
+    if setting in ('REST_FRAMEWORK', 'THROTTLE_BURSTS', 'THROTTLE_CACHE'):
+        _shapes.clear()
+        _buckets.clear()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttles views that set `throttle_scope`, per user when authenticated and per IP otherwise"""
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        shape = get_shape(scope) if scope else None
+        if shape is None:
+            return True
+
+        user = request.user
+        ident = f"user:{user.pk}" if user.is_authenticated else f"ip:{self.get_ident(request)}"
+        self.delay = get_buckets().take(f"throttle:{scope}:{ident}", *shape)
+        return self.delay == 0.0
+
+    def wait(self):
+        return self.delay
@@ -8,25 +8,36 @@ from .views import *
 
 urlpatterns = [
     path("/", Home.as_view(), name='Home'),
-    path('api/account/v1/signup/', SignUpView.as_view(), name='signup'),
-    path('api/account/v1/signin/', SigninView.as_view(), name='token_obtain_pair'),
+    path('api/account/v1/signup/', off_event_loop(SignUpView.as_view()), name='signup'),
+    path('api/account/v1/signin/', off_event_loop(SigninView.as_view()), name='token_obtain_pair'),
     path('api/account/v1/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/account/v1/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
     path('api/account/v1/password_reset/', include('django_rest_passwordreset.urls', namespace='password_reset')),
     path('api/account/v1/logout/', LogoutView.as_view(), name='auth_logout'),
-    path('api/account/v1/change-password/', ChangePasswordView.as_view(), name='change-password'),
+    path('api/account/v1/change-password/', off_event_loop(ChangePasswordView.as_view()), name='change-password'),
     path('api/shop/v1/shop/', ShopGetCreateView.as_view(), name='shop-get-create-update-delete'),
     path('api/shop/v1/products/', ShopProductListView.as_view(), name='product-list-create'),
     path('api/shop/v1/product/<str:product_uuid>/', ShopProductRetrieveUpdateView.as_view(),
          name='product-get-update-delete'),
+    path('api/shop/v1/product/<str:product_uuid>/stock/', ShopProductStockView.as_view(), name='product-stock'),
     path('api/shop/v1/shop-analytics/', ShopAnalyticsView.as_view(), name='shop-analytics'),
+    path('api/shop/v1/sales-report/', ShopSalesReportView.as_view(), name='shop-sales-report'),
+    path('api/shop/v1/orders/transition/', ShopOrderTransitionView.as_view(), name='shop-order-transition'),
+    path('api/shop/v1/reviews/bulk/', ShopReviewBulkCreateView.as_view(), name='shop-reviews-bulk-create'),
+    path('api/shop/v1/reviews/bulk-delete/', ShopReviewBulkDeleteView.as_view(), name='shop-reviews-bulk-delete'),
     path('api/product/v1/products/', ProductViewSet.as_view({'get': 'list'}), name='product-list'),
     path('api/product/v1/product/<str:product_uuid>/', ProductRetrieveView.as_view(), name='product'),
+    path('api/product/v1/product/<str:product_uuid>/recommendations/', ProductRecommendationView.as_view(),
+         name='product-recommendations'),
+    path('api/product/v1/bestsellers/', BestsellerView.as_view(), name='bestsellers'),
     path('api/reviews/v1/reviews/<str:product_uuid>/', ReviewList.as_view(), name='reviews'),
     path('api/reviews/v1/review/<str:review_uuid>/', ReviewRetrieve.as_view(), name='review'),
-    path('api/order/v1/add-to-cart/<str:product_uuid>/', AddToCartView.as_view()),
-    path('api/order/v1/order-confirm/', PendingOrderView.as_view()),
-    path('api/order/v1/order-item/<str:order_item_uuid>/', OrderItemUpdateDelete.as_view()),
-    path('api/order/v1/order-list/', OrderListView.as_view()),
-    path('api/order/v1/order-update/<str:order_uuid>/', UpdateOrderView.as_view())
+    path('api/order/v1/add-to-cart/<str:product_uuid>/', AddToCartView.as_view(), name='add-to-cart'),
+    path('api/order/v1/order-confirm/', PendingOrderView.as_view(), name='order-confirm'),
+    path('api/order/v1/order-item/<str:order_item_uuid>/', OrderItemUpdateDelete.as_view(),
+         name='order-item'),
+    path('api/order/v1/order-list/', OrderListView.as_view(), name='order-list'),
+    path('api/order/v1/order-update/<str:order_uuid>/', UpdateOrderView.as_view(), name='order-update'),
+    path('api/debug/v1/profiles/', ProfileListView.as_view(), name='profiles'),
+    path('api/debug/v1/profiles/<str:name>/<str:kind>/', ProfileDownloadView.as_view(), name='profile-download'),
 ]
@@ -1,15 +1,54 @@
 from django.shortcuts import render
+from django.conf import settings
+from django.db import connections, transaction
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.views.static import serve
 from rest_framework import generics, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser, SAFE_METHODS
 from .serializers import *
 from rest_framework.views import APIView
 from django.contrib.auth.hashers import check_password
+import os
 import uuid
 from rest_framework import viewsets
 from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from decimal import Decimal
+from functools import wraps
+from asgiref.sync import sync_to_async
+from .sales import sales_report, shop_order_summary
+from . import catalog, idempotency, inventory, leaderboards, metrics, outbox, profiling, reviews, sharding
+from .db_router import ReplicaReadMixin, pin_to_primary
+from .fast_serializers import (
+    OrderValuesSerializer, ProductValuesSerializer, ReviewValuesSerializer, as_decimal_string
+)
+from .order_lifecycle import SHOP_SOURCES, InvalidTransition, fulfil_orders, transition_order, transition_orders
+from .permissions import MemoizedObjectMixin, OwnedObjectMixin, ShopOwnerMixin
+
+
+def off_event_loop(view):
+    """
+    Under ASGI, sync views share a single thread, so a CPU heavy view like password hashing stalls every
+    other one. This runs `view` in its own worker thread instead; under WSGI `view` is returned untouched.
+    """
+    if not getattr(settings, 'SERVED_VIA_ASGI', False):
+        return view
+
+    def run(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            # the worker thread isn't covered by the request_finished cleanup
+            connections.close_all()
+
+    @wraps(view)
+    async def offloaded_view(request, *args, **kwargs):
+        return await sync_to_async(run, thread_sensitive=False)(request, *args, **kwargs)
+
+    return offloaded_view
 
 
 # Create your views here.
@@ -24,11 +63,13 @@ class SignUpView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserCreationSerializer
     permission_classes = (AllowAny,)
+    throttle_scope = 'auth'
 
 
 class SigninView(TokenObtainPairView):
     # Replace the serializer with your custom
     serializer_class = MyTokenObtainPairSerializer
+    throttle_scope = 'auth'
 
 
 class LogoutView(generics.CreateAPIView):
@@ -69,12 +110,25 @@ class ChangePasswordView(generics.CreateAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ShopGetCreateView(generics.ListCreateAPIView, generics.RetrieveUpdateDestroyAPIView):
+class ShopGetCreateView(ShopOwnerMixin, generics.ListCreateAPIView, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         return Shop.objects.filter(owner=self.request.user)
 
+    def get_object(self):
+        # an owner has one shop, so updates and deletes need no id in the URL
+        shop = self.get_shop()
+        if shop is None:
+            raise Http404
+        if self.request.method in SAFE_METHODS:
+            return shop
+        # writes start from the row itself, the cached copy may be stale in another worker
+        try:
+            return Shop.objects.get(pk=shop.pk, owner=self.request.user)
+        except Shop.DoesNotExist:
+            raise Http404
+
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return ShopCreateSerializer
@@ -84,60 +138,40 @@ class ShopGetCreateView(generics.ListCreateAPIView, generics.RetrieveUpdateDestr
         serializer.save(owner=self.request.user, shop_uuid=str(uuid.uuid4()))
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        if not queryset.exists():
+        shop = self.get_shop()
+        if shop is None:
             return Response("Please register a shop first", status=status.HTTP_400_BAD_REQUEST)
-        serializer = self.get_serializer(queryset.first())
+        serializer = self.get_serializer(shop)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class ShopProductListView(generics.ListCreateAPIView):
+class ShopProductListView(ShopOwnerMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = ProductCreateSerializer
 
     def get_queryset(self):
-        shop = self.get_shop(owner=self.request.user)
-        if shop:
-            return Product.objects.filter(shop=shop)
-        return Product.objects.none()
-
-    def get_shop(self, owner):
-        try:
-            return Shop.objects.get(owner=owner)
-        except Shop.DoesNotExist:
-            return None
+        # scoped by the owner in the same query, no separate shop lookup
+        return Product.objects.filter(shop__owner=self.request.user).select_related('shop')
 
     def perform_create(self, serializer):
-        shop = self.get_shop(owner=self.request.user)
+        shop = self.get_shop()
         if shop:
             serializer.save(shop=shop, product_uuid=str(uuid.uuid4()))
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        if not queryset.exists():
+        if self.get_shop() is None:
             return Response("Please register a shop first", status=status.HTTP_400_BAD_REQUEST)
-        serializer = self.get_serializer(queryset, many=True)
+        serializer = self.get_serializer(self.get_queryset(), many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class ShopProductRetrieveUpdateView(generics.RetrieveUpdateDestroyAPIView):
+class ShopProductRetrieveUpdateView(MemoizedObjectMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
-
-    def get_shop(self, owner):
-        try:
-            return Shop.objects.get(owner=owner)
-        except Shop.DoesNotExist:
-            return None
+    lookup_field = 'product_uuid'
 
     def get_queryset(self):
-        shop = self.get_shop(owner=self.request.user)
-        if shop:
-            return Product.objects.filter(shop=shop)
-        return Product.objects.none()
-
-    def get_object(self):
-        queryset = self.get_queryset()
-        return generics.get_object_or_404(queryset, product_uuid=self.kwargs['product_uuid'])
+        # products of other shops are simply not found
+        return Product.objects.filter(shop__owner=self.request.user).select_related('shop', 'rating')
 
     def get_serializer_class(self):
         if self.request.method == 'PUT':
@@ -154,39 +188,140 @@ class ShopProductRetrieveUpdateView(generics.RetrieveUpdateDestroyAPIView):
         return self.destroy(request, *args, **kwargs)
 
 
+class ShopProductStockView(generics.RetrieveUpdateAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = StockSerializer
+
+    def get_object(self):
+        product = generics.get_object_or_404(
+            Product.objects.filter(shop__owner=self.request.user), product_uuid=self.kwargs['product_uuid']
+        )
+        stock, _ = Stock.objects.get_or_create(product=product)
+        return stock
+
+    def perform_update(self, serializer):
+        # only `available` is written so concurrent reservations aren't lost
+        Stock.objects.filter(id=serializer.instance.id).update(available=serializer.validated_data['available'])
+        serializer.instance.refresh_from_db()
+
+
 class ProductPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = ProductSerializer
     queryset = Product.objects.all()
     pagination_class = ProductPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['category']
+    throttle_scope = 'catalog'
 
+    def list(self, request, *args, **kwargs):
+        # plain category/page requests are answered with the stored page, see catalog.py
+        snapshot = catalog.page_key(request)
+        if snapshot is not None:
+            response = catalog.cached_response(snapshot, request)
+            if response is not None:
+                return response
+
+        # read-only fast path, same output as ProductSerializer
+        queryset = self.filter_queryset(self.get_queryset())
+        if snapshot is not None:
+            # a lagging replica would freeze its stale rows into the stored page
+            queryset = queryset.using('default')
+        fields = ProductValuesSerializer.requested_fields(request)
+        page = self.paginate_queryset(ProductValuesSerializer.values(queryset, fields))
+        if page is not None:
+            response = self.get_paginated_response(ProductValuesSerializer(page, request=request, fields=fields).data)
+        else:
+            response = Response(ProductValuesSerializer(queryset, request=request, fields=fields).data)
 
-class ProductRetrieveView(APIView):
-    permission_classes = [AllowAny]
+        if snapshot is not None and response.status_code == 200:
+            body = request.accepted_renderer.render(response.data, request.accepted_media_type,
+                                                    self.get_renderer_context())
+            return catalog.materialize(snapshot, request, body)
+        return response
 
-    def get_product(self, product_uuid):
-        try:
-            return Product.objects.get(product_uuid=product_uuid)
-        except Product.DoesNotExist:
-            return None
+
+class ProductRetrieveView(ReplicaReadMixin, APIView):
+    permission_classes = [AllowAny]
+    throttle_scope = 'catalog'
 
     def get(self, request, product_uuid):
-        product = self.get_product(product_uuid=product_uuid)
-        if not product:
+        # same output as ProductSerializer, trimmed to ?fields= / ?exclude=
+        fields = ProductValuesSerializer.requested_fields(request)
+        products = ProductValuesSerializer(Product.objects.filter(product_uuid=product_uuid), fields=fields).data
+        if not products:
             return Response("There is no product with this id", status=status.HTTP_400_BAD_REQUEST)
+        return Response(products[0], status=status.HTTP_200_OK)
 
-        serializer = ProductSerializer(product)
-        return Response(serializer.data, status=status.HTTP_200_OK)
 
+class ProductRecommendationView(ReplicaReadMixin, APIView):
+    permission_classes = [AllowAny]
+    throttle_scope = 'catalog'
+
+    def get(self, request, product_uuid):
+        # precomputed by ecommerce.recommendations, one indexed read whatever the order history size
+        recommended = ProductRecommendation.objects.filter(product__product_uuid=product_uuid).values(
+            'recommended__product_uuid', 'recommended__name', 'recommended__price', 'score'
+        )
+        return Response([
+            {
+                'product_uuid': row['recommended__product_uuid'],
+                'name': row['recommended__name'],
+                'price': as_decimal_string(row['recommended__price'], request),
+                'score': row['score'],
+            }
+            for row in recommended
+        ], status=status.HTTP_200_OK)
+
+
+class BestsellerView(ReplicaReadMixin, APIView):
+    permission_classes = [AllowAny]
+    throttle_scope = 'catalog'
+
+    def get(self, request):
+        query = BestsellerQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        if 'shop' in params:
+            shop_id = Shop.objects.filter(shop_uuid=params['shop']).values_list('id', flat=True).first()
+            if shop_id is None:
+                return Response("Shop not found", status=status.HTTP_404_NOT_FOUND)
+            scope = leaderboards.shop_scope(shop_id)
+        elif 'category' in params:
+            scope = leaderboards.category_scope(params['category'])
+        else:
+            scope = leaderboards.global_scope()
 
-class ReviewList(generics.ListCreateAPIView):
+        # maintained by ecommerce.leaderboards, reads `limit` index entries whatever the order history size
+        bestsellers = leaderboards.top_sellers(scope, params['window'], params['limit']).values(
+            'product__product_uuid', 'product__name', 'product__price', 'units'
+        )
+        return Response([
+            {
+                'rank': rank,
+                'product_uuid': row['product__product_uuid'],
+                'name': row['product__name'],
+                'price': as_decimal_string(row['product__price'], request),
+                'units': row['units'],
+            }
+            for rank, row in enumerate(bestsellers, 1)
+        ], status=status.HTTP_200_OK)
+
+
+def review_event(review):
+    """Outbox payload of the review.* events"""
+    return {'review_id': review.id, 'review_uuid': review.review_uuid, 'product_id': review.product_id,
+            'user_id': review.user_id, 'ratings': review.ratings}
+
+
+class ReviewList(ReplicaReadMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_product(self, product_uuid):
@@ -207,11 +342,19 @@ class ReviewList(generics.ListCreateAPIView):
             return ReviewCreateSerializer
         return ReviewSerializer
 
+    def list(self, request, *args, **kwargs):
+        # read-only fast path, same output as ReviewSerializer
+        fields = ReviewValuesSerializer.requested_fields(request)
+        return Response(ReviewValuesSerializer(self.get_queryset(), request=request, fields=fields).data)
+
+    @transaction.atomic
     def perform_create(self, serializer):
         product_uuid = self.kwargs.get('product_uuid')
         product = self.get_product(product_uuid)
         if product:
-            serializer.save(product=product, user=self.request.user, review_uuid=str(uuid.uuid4()))
+            review = serializer.save(product=product, user=self.request.user, review_uuid=str(uuid.uuid4()))
+            outbox.publish('review.created', review_event(review))
+            metrics.inc_on_commit('reviews_posted_total')
 
     def post(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
@@ -220,27 +363,41 @@ class ReviewList(generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class ReviewRetrieve(generics.RetrieveUpdateDestroyAPIView):
+class ReviewRetrieve(OwnedObjectMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
-    queryset = Review.objects.all()
+    # the serializer shows the product name and author, fetched with the review
+    queryset = Review.objects.select_related('product', 'user')
     serializer_class = ReviewUpdateSerializer
+    lookup_field = 'review_uuid'
 
     def put(self, request, *args, **kwargs):
+        # get_object is memoized, the update below reuses this review
         review = self.get_object()
-        if review.user != request.user:
+        if not self.is_owner(review):
             return Response("You can't edit this review", status=status.HTTP_400_BAD_REQUEST)
 
         return super().put(request, *args, **kwargs)
 
     def delete(self, request, *args, **kwargs):
         review = self.get_object()
-        if review.user != request.user:
+        if not self.is_owner(review):
             return Response("You can't delete this review", status=status.HTTP_400_BAD_REQUEST)
 
         return super().delete(request, *args, **kwargs)
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        review = serializer.save()
+        outbox.publish('review.updated', review_event(review))
 
-class AddToCartView(APIView):
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        event = review_event(instance)
+        instance.delete()
+        outbox.publish('review.deleted', event)
+
+
+class AddToCartView(sharding.CustomerShardMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get_product(self, product_uuid):
@@ -261,38 +418,45 @@ class AddToCartView(APIView):
         except OrderItem.DoesNotExist:
             return None
 
+    @idempotency.idempotent
+    @sharding.atomic()
     def get(self, request, product_uuid):
-        order = self.get_order(user=request.user)
-        if not order:
-            try:
-                order = Order.objects.create(order_uuid=str(uuid.uuid4()), customer=request.user)
-                order.save()
-            except Exception as e:
-                return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
-
         product = self.get_product(product_uuid=product_uuid)
         if not product:
             return Response('No product found with this id', status=status.HTTP_400_BAD_REQUEST)
 
+        order = self.get_order(user=request.user)
+        if not order:
+            # errors raise: a transient one ("database is locked") becomes a 500, which idempotency keys don't replay
+            order = Order.objects.create(order_uuid=str(uuid.uuid4()), customer=request.user)
+            order.save()
+            metrics.inc_on_commit('carts_created_total')
+
+        # this GET writes, so the next reads of this user must see it
+        pin_to_primary(request.user)
         order_item = self.get_order_item(product=product, order=order, user=request.user)
-        if not order_item:
-            try:
-                order_item = OrderItem.objects.create(
-                    order_item_uuid=str(uuid.uuid4()),
-                    product=product,
-                    quantity=1,
-                    item_price=Decimal(product.price),  # Convert product price to Decimal
-                    order=order,
-                    customer=request.user
-                )
-                order_item.save()
-
-                order.total_price += Decimal(order_item.item_price)  # Convert item_price to Decimal
-                order.save()
+        try:
+            inventory.reserve(order, product, order_item.quantity + 1 if order_item else 1)
+        except inventory.OutOfStock:
+            return Response("This product is out of stock", status=status.HTTP_400_BAD_REQUEST)
+        metrics.inc_on_commit('add_to_cart_total')
 
-                return Response("Your product is added to the cart", status=status.HTTP_200_OK)
-            except Exception as e:
-                return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
+        if not order_item:
+            # a failure raises and rolls the reservation above back with the rest of the transaction
+            order_item = OrderItem.objects.create(
+                order_item_uuid=str(uuid.uuid4()),
+                product=product,
+                quantity=1,
+                item_price=Decimal(product.price),  # Convert product price to Decimal
+                order=order,
+                customer=request.user
+            )
+            order_item.save()
+
+            order.total_price += Decimal(order_item.item_price)  # Convert item_price to Decimal
+            order.save()
+
+            return Response("Your product is added to the cart", status=status.HTTP_200_OK)
 
         previous_price = Decimal(order_item.item_price)  # Convert item_price to Decimal
         previous_quantity = order_item.quantity
@@ -306,7 +470,7 @@ class AddToCartView(APIView):
         return Response("Your product is added to the cart", status=status.HTTP_200_OK)
 
 
-class PendingOrderView(APIView):
+class PendingOrderView(sharding.CustomerShardMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get_order(self, user):
@@ -317,10 +481,15 @@ class PendingOrderView(APIView):
 
     def get(self, request):
         order = self.get_order(user=request.user)
+        if not order and not getattr(settings, 'CREATE_EMPTY_CART_ON_VIEW', True):
+            # show an empty cart without storing it, AddToCartView creates it on the first item
+            order_serializer = OrderSerializer(Order(customer=request.user))
+            return Response({'order': order_serializer.data, 'order_items': []}, status=status.HTTP_200_OK)
         if not order:
             try:
                 order = Order.objects.create(**{'order_uuid': str(uuid.uuid4()), 'customer': request.user})
                 order.save()
+                metrics.inc_on_commit('carts_created_total')
             except Exception as e:
                 return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
 
@@ -330,6 +499,8 @@ class PendingOrderView(APIView):
         return Response({'order': order_serializer.data, 'order_items': order_item_serializer.data},
                         status=status.HTTP_200_OK)
 
+    @idempotency.idempotent
+    @sharding.atomic()
     def put(self, request):
         order = self.get_order(user=request.user)
         order_serializer = UpdateOrderSerializer(order, data=request.data, partial=True)
@@ -342,16 +513,40 @@ class PendingOrderView(APIView):
         return Response(order_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class OrderItemUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
+class OrderItemUpdateDelete(sharding.CustomerShardMixin, MemoizedObjectMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = OrderItemSerializer
     lookup_field = 'order_item_uuid'  # Specify the lookup field
 
     def get_queryset(self):
-        return OrderItem.objects.filter(customer=self.request.user)
+        # updates read the order and product of the item, products can't be joined from an order shard
+        queryset = OrderItem.objects.filter(customer=self.request.user).select_related('order')
+        return queryset if sharding.is_sharded() else queryset.select_related('product')
+
+    @idempotency.idempotent
+    def put(self, request, *args, **kwargs):
+        return super().put(request, *args, **kwargs)
 
+    @idempotency.idempotent
+    def patch(self, request, *args, **kwargs):
+        return super().patch(request, *args, **kwargs)
+
+    @idempotency.idempotent
+    def delete(self, request, *args, **kwargs):
+        return super().delete(request, *args, **kwargs)
+
+    def reserve(self, order_item, quantity):
+        if order_item.order.status != 'Pending' or not order_item.product:
+            return
+        try:
+            inventory.reserve(order_item.order, order_item.product, quantity)
+        except inventory.OutOfStock:
+            raise serializers.ValidationError("This product is out of stock")
+
+    @sharding.atomic()
     def perform_update(self, serializer):
-        quantity = self.request.data.get('quantity', 1)
+        quantity = serializer.validated_data.get('quantity', 1)
+        self.reserve(serializer.instance, quantity)
         if quantity == 0:
             order_item = serializer.instance
             order_item.order.total_price -= order_item.item_price
@@ -366,90 +561,290 @@ class OrderItemUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
             serializer.save()
             serializer.instance.order.save()
 
+    @sharding.atomic()
     def perform_destroy(self, instance):
+        self.reserve(instance, 0)
         instance.order.total_price -= instance.item_price
         instance.order.save()
         instance.delete()
 
 
-class OrderListView(APIView):
+class OrderListView(sharding.CustomerShardMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        fields = OrderValuesSerializer.requested_fields(request)
+        # the orders are all the caller's, their name isn't joined from the users
+        known = {'customer_name': request.user.full_name}
         orders = Order.get_completed_orders_for_user(request.user)
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = OrderValuesSerializer(orders, request=request, fields=fields, known=known)
+        archived_orders = ArchivedOrder.objects.filter(customer=request.user)
+        archived_serializer = OrderValuesSerializer(archived_orders, request=request, fields=fields, known=known)
+        return Response(serializer.data + archived_serializer.data, status=status.HTTP_200_OK)
 
 
-class UpdateOrderView(APIView):
+class UpdateOrderView(sharding.CustomerShardMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get_order(self, order_uuid, user):
         try:
-            return Order.objects.get(order_uuid=order_uuid, customer=user)
+            order = Order.objects.get(order_uuid=order_uuid, customer=user)
         except Order.DoesNotExist:
             return None
+        # the customer name is part of the response, and the customer is the caller
+        order.customer = user
+        return order
 
     def get(self, request, order_uuid):
-        order = self.get_order(order_uuid=order_uuid, user=request.user)
-        if not order:
-            return Response("There is no order associate with this id", status=status.HTTP_400_BAD_REQUEST)
-        serializer = OrderSerializer(order)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-
+        # same output as OrderSerializer, trimmed to ?fields= / ?exclude=
+        fields = OrderValuesSerializer.requested_fields(request)
+        for model in (Order, ArchivedOrder):
+            orders = OrderValuesSerializer(
+                model.objects.filter(order_uuid=order_uuid, customer=request.user), fields=fields,
+                known={'customer_name': request.user.full_name}
+            ).data
+            if orders:
+                return Response(orders[0], status=status.HTTP_200_OK)
+        return Response("There is no order associate with this id", status=status.HTTP_400_BAD_REQUEST)
+
+    @idempotency.idempotent
     def put(self, request, order_uuid):
         order = self.get_order(order_uuid=order_uuid, user=request.user)
         if not order:
             return Response("There is no order associate with this id", status=status.HTTP_400_BAD_REQUEST)
-        order.status = 'Completed'
-        order.save()
+
+        # customers can place their cart or cancel it, the shop takes it from there
+        new_status = request.data.get('status', 'Processing')
+        if new_status not in ('Processing', 'Cancelled'):
+            return Response("You can't move an order to this status", status=status.HTTP_400_BAD_REQUEST)
+        try:
+            transition_order(order, new_status)
+        except InvalidTransition as e:
+            return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
+        except inventory.OutOfStock:
+            return Response("Some products of this order are out of stock", status=status.HTTP_400_BAD_REQUEST)
         serializer = OrderSerializer(order)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class ShopAnalyticsView(APIView):
+class ShopOrderTransitionView(ShopOwnerMixin, generics.CreateAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = OrderTransitionSerializer
+
+    @idempotency.idempotent
+    def create(self, request, *args, **kwargs):
+        shop = self.get_shop()
+        if shop is None:
+            return Response("Please register a shop first", status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_uuids = set(serializer.validated_data['order_uuids'])
+        new_status = serializer.validated_data['status']
+
+        # orders holding this shop's products, the products can't be joined from an order shard
+        product_ids = list(Product.objects.filter(shop=shop).values_list('id', flat=True))
+        orders = Order.objects.filter(
+            order_uuid__in=order_uuids, id__in=OrderItem.objects.filter(product_id__in=product_ids).values('order_id')
+        )
+        if new_status != 'Completed':
+            # a shop can't cancel what other shops are selling too
+            other_shops_items = OrderItem.objects.filter(order__isnull=False, product__isnull=False).exclude(
+                product_id__in=product_ids
+            )
+            orders = orders.exclude(id__in=other_shops_items.values('order_id'))
+        # one transaction per shard
+        moved_uuids = set()
+        waiting_uuids = set()
+        for shard_orders in sharding.scatter(orders):
+            waiting = set()
+            try:
+                if new_status == 'Completed':
+                    # each shop completes its own items, the order once no shop has any left
+                    moved, waiting = fulfil_orders(shard_orders, product_ids)
+                else:
+                    moved = transition_orders(shard_orders, new_status, from_statuses=SHOP_SOURCES)
+            except InvalidTransition as e:
+                return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
+            moved_uuids |= set(shard_orders.filter(id__in=moved.keys()).values_list('order_uuid', flat=True))
+            waiting_uuids |= set(shard_orders.filter(id__in=waiting).values_list('order_uuid', flat=True))
+        return Response({
+            'status': new_status,
+            'updated': len(moved_uuids),
+            'order_uuids': sorted(moved_uuids),
+            # done by this shop, still waiting for the others
+            'fulfilled': sorted(waiting_uuids),
+            'skipped': sorted(order_uuids - moved_uuids - waiting_uuids),
+        }, status=status.HTTP_200_OK)
+
+
+class ShopReviewBulkCreateView(ShopOwnerMixin, generics.CreateAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = BulkReviewCreateSerializer
+
+    def create(self, request, *args, **kwargs):
+        shop = self.get_shop()
+        if shop is None:
+            return Response("Please register a shop first", status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # imported reviews have no author on this site
+        created, errors = reviews.bulk_create_reviews(shop, serializer.validated_data['reviews'])
+        return Response({'created': created, 'errors': errors}, status=status.HTTP_201_CREATED)
+
+
+class ShopReviewBulkDeleteView(ShopOwnerMixin, generics.CreateAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = BulkReviewDeleteSerializer
+
+    def create(self, request, *args, **kwargs):
+        shop = self.get_shop()
+        if shop is None:
+            return Response("Please register a shop first", status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        deleted = sum(reviews.bulk_delete_reviews(reviews.shop_reviews(shop, **serializer.validated_data)))
+        return Response({'deleted': deleted}, status=status.HTTP_200_OK)
+
+
+class ShopAnalyticsView(ShopOwnerMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        try:
-            shop = Shop.objects.get(owner=request.user)
-        except Shop.DoesNotExist:
+        shop = self.get_shop()
+        if shop is None:
             return Response("Shop not found", status=status.HTTP_404_NOT_FOUND)
 
-        # Calculate total revenue for the shop
-        total_revenue = OrderItem.objects.filter(order__status='Completed', product__shop=shop).aggregate(
-            total_revenue=models.Sum(models.F('item_price'))
-        )['total_revenue'] or 0.0
-
-        # Get the total number of orders
-        total_orders = OrderItem.objects.filter(order__status='Completed', product__shop=shop).count()
+        # Revenue, orders and pending items, gathered from every order shard and the archive
+        summary = shop_order_summary(shop)
 
-        # Get the top-selling products
-        top_selling_products = OrderItem.objects.filter(order__status='Completed', product__shop=shop).values(
-            'product__name'
-        ).annotate(
-            total_quantity=models.Sum('quantity')
-        ).order_by('-total_quantity')[:5]
+        # Get the top-selling products from the shop's leaderboard
+        top_selling_products = leaderboards.shop_top_sellers(shop, limit=5)
 
         # Get reviews for products in the shop
         product_reviews = Review.objects.filter(product__shop=shop)
         review_serializer = ReviewSerializer(product_reviews, many=True)
 
-        # Get products in the shop where the order is pending
-        pending_order_products = OrderItem.objects.filter(order__status='Pending', product__shop=shop).values(
-            'product__name', 'quantity'
-        )
-
         # Prepare the response data
         response_data = {
-            'total_revenue': total_revenue,
-            'total_orders': total_orders,
+            'total_revenue': summary['total_revenue'],
+            'total_orders': summary['total_orders'],
             'top_selling_products': top_selling_products,
             'product_reviews': review_serializer.data,
-            'pending_order_products': pending_order_products,
+            'pending_order_products': summary['pending_order_products'],
         }
 
         # Serialize the data and return the response
         serializer = ShopSerializer(shop)
         response_data['shop_details'] = serializer.data
         return Response(response_data, status=status.HTTP_200_OK)
+
+
+class ShopSalesReportView(ShopOwnerMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        shop = self.get_shop()
+        if shop is None:
+            return Response("Shop not found", status=status.HTTP_404_NOT_FOUND)
+
+        query = SalesReportQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        buckets = sales_report(
+            shop,
+            start=query.validated_data['start'],
+            end=query.validated_data['end'],
+            interval=query.validated_data['interval'],
+            product_uuid=query.validated_data.get('product'),
+        )
+        return Response({
+            'interval': query.validated_data['interval'],
+            'sales': [
+                {
+                    'period': bucket['period'],
+                    'product_uuid': bucket['product__product_uuid'],
+                    'product_name': bucket['product__name'],
+                    'revenue': bucket['revenue'],
+                    'units': bucket['units'],
+                    'orders': bucket['orders'],
+                }
+                for bucket in buckets
+            ]
+        }, status=status.HTTP_200_OK)
+
+
+class ProfileListView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(profiling.list_profiles(), status=status.HTTP_200_OK)
+
+
+class ProfileDownloadView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, name, kind):
+        path = profiling.get_profile_file(name, kind)
+        if path is None:
+            return Response("Profile not found", status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name,
+                            content_type=profiling.PROFILE_FILES[kind])
+
+
+def metrics_view(request):
+    """Prometheus scrape target, needs `Authorization: Bearer <METRICS_TOKEN>`, closed while that setting is unset"""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        return HttpResponse("Metrics are disabled until METRICS_TOKEN is set", status=status.HTTP_403_FORBIDDEN,
+                            content_type='text/plain')
+    if not constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return HttpResponse("Invalid metrics token", status=status.HTTP_401_UNAUTHORIZED, content_type='text/plain')
+    return HttpResponse(metrics.render(metrics.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def serve_media(request, path, document_root=None):
+    """Serves uploads, product images are content-hashed so they can be cached for good"""
+    response = serve(request, path, document_root=document_root)
+    if path.startswith('product_images/'):
+        patch_cache_control(response, public=True, immutable=True,
+                            max_age=getattr(settings, 'MEDIA_CACHE_MAX_AGE', 365 * 24 * 60 * 60))
+    return response
+
+
+_docs = {}
+
+
+def openapi_json():
+    """The schema as JSON, read from OPENAPI_SCHEMA_FILE when it was generated at deploy time"""
+    if 'json' not in _docs:
+        path = getattr(settings, 'OPENAPI_SCHEMA_FILE', None)
+        if path and os.path.exists(path):
+            with open(path, 'rb') as schema_file:
+                _docs['json'] = schema_file.read()
+        else:
+            from . import schema
+            _docs['json'] = schema.render_json()
+    return _docs['json']
+
+
+def docs_view(renderer=None):
+    """
+    The drf_yasg schema view, or its `swagger` / `redoc` page, which imports drf_yasg on its first request.
+    Requests for the schema as JSON are answered with openapi_json() without loading drf_yasg.
+    """
+    def view(request, *args, **kwargs):
+        if kwargs.get('format') == '.json':
+            return HttpResponse(openapi_json(), content_type='application/json; charset=utf-8')
+        if request.GET.get('format') == 'openapi':
+            return HttpResponse(openapi_json(), content_type='application/openapi+json; charset=utf-8')
+        if renderer not in _docs:
+            from .schema import schema_view
+            _docs[renderer] = schema_view.with_ui(renderer, cache_timeout=0) if renderer else \
+                schema_view.without_ui(cache_timeout=0)
+        return _docs[renderer](request, *args, **kwargs)
+
+    return view
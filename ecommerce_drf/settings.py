@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 from datetime import datetime, timedelta
@@ -43,9 +44,11 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt.token_blacklist',
     'django_rest_passwordreset',
     'django_cleanup.apps.CleanupConfig',
-    'drf_yasg',
     'django_filters'
 ]
+# drf_yasg isn't an installed app: installing it imports it (and pkg_resources) in every process, while only
+# the docs views use it. Those import it on their first request, its templates and static files are added below.
+DRF_YASG_DIR = Path(find_spec('drf_yasg').origin).parent
 
 AUTH_USER_MODEL = 'ecommerce.User'
 
@@ -53,10 +56,33 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'ecommerce.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'ecommerce.throttling.TokenBucketThrottle',
+    ),
+    # token bucket refill rate per `throttle_scope` of a view, see ecommerce/throttling.py
+    'DEFAULT_THROTTLE_RATES': {
+        'catalog': '120/min',
+        'auth': '10/min',
+    },
+}
+
+# Token bucket size per throttle scope, defaults to the request count of its rate
+THROTTLE_BURSTS = {
+    'catalog': 240,
+    'auth': 5,
 }
+# Cache alias holding the buckets so all workers share them, None keeps them per process
+THROTTLE_CACHE = os.environ.get('THROTTLE_CACHE')
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'ecommerce.middleware.MetricsMiddleware',
+    'ecommerce.middleware.ProfilingMiddleware',
+    'ecommerce.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,6 +90,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'ecommerce.middleware.PrimaryPinMiddleware',
 ]
 
 ROOT_URLCONF = 'ecommerce_drf.urls'
@@ -71,7 +98,7 @@ ROOT_URLCONF = 'ecommerce_drf.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [BASE_DIR / 'templates']
+        'DIRS': [BASE_DIR / 'templates', DRF_YASG_DIR / 'templates']
         ,
         'APP_DIRS': True,
         'OPTIONS': {
@@ -97,6 +124,46 @@ DATABASES = {
     }
 }
 
+# SQLite performance mode for small multi-worker deployments, see ecommerce/backends/sqlite3
+SQLITE_PERFORMANCE_OPTIONS = {
+    'timeout': 20,
+    'transaction_mode': 'IMMEDIATE',
+    'pragmas': {
+        'journal_mode': 'WAL',
+        'busy_timeout': 20000,
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+    },
+}
+if os.environ.get('SQLITE_PERFORMANCE_MODE'):
+    DATABASES['default'].update({
+        'ENGINE': 'ecommerce.backends.sqlite3',
+        'OPTIONS': SQLITE_PERFORMANCE_OPTIONS,
+    })
+
+# Read replica, catalog and analytics reads are sent there by ecommerce.db_router
+# Locally any copy of the primary works, e.g. REPLICA_DATABASE=replica.sqlite3 + `manage.py sync_sqlite_replica`
+if os.environ.get('REPLICA_DATABASE'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / os.environ['REPLICA_DATABASE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+# Orders, their items and stock reservations are split by customer across these databases, see ecommerce/sharding.py
+# Locally e.g. ORDER_SHARD_DATABASES=orders_0.sqlite3,orders_1.sqlite3 + `manage.py migrate --database orders_<n>`
+if os.environ.get('ORDER_SHARD_DATABASES'):
+    for index, name in enumerate(os.environ['ORDER_SHARD_DATABASES'].split(',')):
+        DATABASES[f'orders_{index}'] = {**DATABASES['default'], 'NAME': BASE_DIR / name}
+ORDER_SHARDS = [alias for alias in DATABASES if alias.startswith('orders_')] or ['default']
+DATABASE_ROUTERS = ['ecommerce.sharding.OrderShardRouter', 'ecommerce.db_router.PrimaryReplicaRouter']
+# Users read from the primary for this long after a write so they see their own changes
+DATABASE_REPLICA_PIN_SECONDS = 10
+# Cache alias holding those pins so all workers share them, None keeps them in the per-process default cache
+DATABASE_REPLICA_PIN_CACHE = os.environ.get('DATABASE_REPLICA_PIN_CACHE')
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -151,6 +218,28 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing profile, the first hasher hashes new passwords and the others still verify old ones
+# strong: Django's default PBKDF2 cost, balanced: PBKDF2 with PASSWORD_HASH_ITERATIONS,
+# argon2: needs argon2-cffi. Compare them with `manage.py bench_password_hashing`
+PASSWORD_HASHING_PROFILE = os.environ.get('PASSWORD_HASHING_PROFILE', 'strong')
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 260000))
+PASSWORD_HASHING_PROFILES = {
+    'strong': ['django.contrib.auth.hashers.PBKDF2PasswordHasher'],
+    'balanced': ['ecommerce.hashers.ConfigurablePBKDF2PasswordHasher'],
+    'argon2': ['django.contrib.auth.hashers.Argon2PasswordHasher'],
+}
+PASSWORD_HASHERS = PASSWORD_HASHING_PROFILES[PASSWORD_HASHING_PROFILE] + [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASHERS = list(dict.fromkeys(PASSWORD_HASHERS))
+
+# Set by asgi.py, CPU heavy auth views then run in their own threads, see ecommerce.views.off_event_loop
+SERVED_VIA_ASGI = bool(os.environ.get('SERVED_VIA_ASGI'))
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -171,13 +260,82 @@ STATIC_URL = 'static/'
 # Extra places for collectstatic to find static files.
 STATICFILES_DIRS = (
     os.path.join(BASE_DIR, 'static'),
+    DRF_YASG_DIR / 'static',
 )
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+# Serve uploads from Django, product images get far-future cache headers so a CDN in front can keep them
+SERVE_MEDIA = DEBUG or bool(os.environ.get('SERVE_MEDIA'))
+MEDIA_CACHE_MAX_AGE = 365 * 24 * 60 * 60
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+
+# JSON responses at least this long are gzip/brotli compressed by ecommerce.middleware.CompressionMiddleware
+API_COMPRESSION_MIN_SIZE = 1024
+API_COMPRESSION_TYPES = ('application/json',)
+
+# OpenAPI schema written by `manage.py generate_openapi_schema` at deploy time and served as is by /docs.json/,
+# without it each process builds the schema on its first docs request
+OPENAPI_SCHEMA_FILE = BASE_DIR / 'openapi.json'
+
+# Product list pages stored pre-rendered and compressed, per category, see ecommerce.catalog
+CATALOG_SNAPSHOT_ENABLED = True
+# Shared by the workers of a server, each server keeps its own
+CATALOG_SNAPSHOT_DIR = BASE_DIR / 'catalog_snapshot'
+# Seconds after which a page is rebuilt even if no product change was seen, e.g. one made on another server
+CATALOG_SNAPSHOT_MAX_AGE = 300
+# Pages each worker also keeps in memory
+CATALOG_SNAPSHOT_MEMORY_PAGES = 512
+
+# Request and domain metrics, exported at /metrics, see ecommerce.metrics
+METRICS_ENABLED = True
+# Directory shared by all gunicorn workers so /metrics adds up every worker, None keeps them per process
+METRICS_DIR = os.environ.get('METRICS_DIR')
+# Seconds between two snapshots of a worker's metrics to METRICS_DIR
+METRICS_FLUSH_INTERVAL = 1.0
+# Scrapers must send `Authorization: Bearer <METRICS_TOKEN>`, /metrics answers 403 while it is unset
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Request profiling by ecommerce.middleware.ProfilingMiddleware, off unless PROFILING_ENABLED is set.
+# Staff trigger it per request with the PROFILING_HEADER header, profiles are listed at /api/debug/v1/profiles/
+PROFILING_ENABLED = bool(os.environ.get('PROFILING_ENABLED'))
+# Fraction of all requests profiled, e.g. 0.01
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.0))
+PROFILING_HEADER = 'X-Profile'
+# Seconds between two stack samples of the profiled request
+PROFILING_SAMPLE_INTERVAL = 0.001
+PROFILING_DIR = BASE_DIR / 'profiles'
+# Profiles kept, the oldest are deleted first
+PROFILING_KEEP = 200
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+
+# Carts and orders
+# Pending orders hold their stock this long after the last change
+STOCK_RESERVATION_TTL = timedelta(minutes=30)
+# Pending orders untouched for this long are removed by `manage.py cleanup_pending_orders`
+STALE_PENDING_ORDER_AGE = timedelta(days=30)
+# Whether viewing an empty cart stores an empty pending order
+CREATE_EMPTY_CART_ON_VIEW = True
+# Completed orders older than this are moved to the archive tables by `manage.py archive_orders`
+ORDER_ARCHIVE_AGE = timedelta(days=90)
+# Products kept per "customers also bought" list, rebuilt with `manage.py build_recommendations`
+RECOMMENDATIONS_TOP_K = 10
+# Seconds a vendor's shop stays cached between requests, dropped early when the shop is saved or deleted
+SHOP_CACHE_TIMEOUT = 300
+# Seconds the response to a cart or order request sent with an Idempotency-Key is replayed to its retries
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+# Seconds a retry waits for the same request still running elsewhere before getting a 409
+IDEMPOTENCY_WAIT = 10
+# Cache alias holding the idempotency keys so all workers share them, None keeps them per process
+IDEMPOTENCY_CACHE = os.environ.get('IDEMPOTENCY_CACHE')
+
+# Outbox events are handed to their consumers by `manage.py drain_outbox --loop`
+OUTBOX_BATCH_SIZE = 500
+# Attempts per handler before an event is left as a dead letter
+OUTBOX_MAX_ATTEMPTS = 5
+# Processed events are kept this long for inspection
+OUTBOX_RETENTION = timedelta(days=7)
@@ -10,7 +10,12 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_drf.settings')
 
 application = get_wsgi_application()
+
+# Import the URLconf, and every view with it, now instead of on the first request. With gunicorn's
+# preload_app (see gunicorn.conf.py) that's done once in the master and shared by the workers.
+get_resolver().url_patterns
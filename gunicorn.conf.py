@@ -0,0 +1,8 @@
+"""
+gunicorn settings, read from the directory gunicorn is started in.
+
+The application is loaded once in the master and the workers are forked from it: they boot without
+importing anything and share the memory holding the code. A HUP restarts the workers without reloading
+the code, restart gunicorn to deploy.
+"""
+preload_app = True